@@ -0,0 +1,41 @@
+# app/logging_config.py
+
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging() -> QueueListener:
+    """
+    Route the app's log records through a queue to a background thread.
+
+    Backend Engineering Concept: Non-blocking Logging
+    - Handlers write to stderr synchronously, which can stall the event loop
+    - QueueHandler only enqueues the record on the request path
+    - QueueListener does the actual I/O on its own thread
+
+    Only the "app" logger tree is configured, so Uvicorn's own logging
+    config is left alone.
+    """
+    global _listener
+
+    if _listener is not None:
+        return _listener
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    app_logger.addHandler(QueueHandler(log_queue))
+    app_logger.propagate = False
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
@@ -1,18 +1,58 @@
 # app/main.py
 
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import Depends, FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.datastructures import UploadFile
 import os
-from datetime import datetime
+import asyncio
+import logging
+import orjson
+import time
+from datetime import datetime, timezone
 from dotenv import load_dotenv
+from openai import NotFoundError
 
 # Load environment variables
 load_dotenv()
 
+# Configure logging before the services create their loggers
+from app.logging_config import setup_logging
+
+log_listener = setup_logging()
+logger = logging.getLogger(__name__)
+
 # Import our services
-from app.services.file_parser import parse_resume_file
-from app.services.ai_analyzer import analyze_resume_with_ai
+from app.services.file_parser import close_parser_pool, parse_resume_file
+from app.services.ai_analyzer import (
+    AIAnalyzer,
+    analyze_many_with_ai,
+    analyze_resume_with_ai,
+    get_ai_analyzer,
+    get_batch_analysis,
+    get_cache_status,
+    preprocess_job_description,
+    stream_analysis_with_ai,
+    submit_batch_analysis,
+)
+from app.services.upload_stream import MAX_UPLOAD_BYTES, get_upload_size, read_upload_form
+
+# Supported resume formats
+ALLOWED_EXT = frozenset({'.pdf', '.docx', '.txt'})
+ALLOWED_EXT_MSG = "Unsupported file type. Supported: .pdf, .docx, .txt"
+
+# Most resumes accepted by one /analyze/many request
+MAX_RESUMES_PER_REQUEST = 20
+
+# Last formatted timestamp, as [epoch second, ISO string]
+_ts_cache = [0, ""]
+
+def now_iso() -> str:
+    """Current UTC time as ISO 8601, formatted at most once per second."""
+    t = int(time.time())
+    if t != _ts_cache[0]:
+        _ts_cache[:] = [t, datetime.fromtimestamp(t, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")]
+    return _ts_cache[1]
 
 # Create FastAPI instance
 app = FastAPI(
@@ -20,7 +60,8 @@ app = FastAPI(
     description="AI-powered resume analysis for job compatibility",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # CORS Middleware
@@ -30,8 +71,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Cache"],
 )
 
+@app.on_event("startup")
+async def warm_ai_analyzer():
+    """Build the AI analyzer and open its OpenAI connection before serving traffic."""
+    try:
+        app.state.analyzer = AIAnalyzer()
+    except ValueError as e:
+        # Missing API key: keep serving; analysis endpoints report 503
+        app.state.analyzer = None
+        logger.warning("AI analyzer not initialized: %s", e)
+        return
+    
+    await app.state.analyzer.warm_up()
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    """Close the OpenAI connection pool."""
+    analyzer = getattr(app.state, "analyzer", None)
+    if analyzer is not None:
+        await analyzer.aclose()
+
+@app.on_event("shutdown")
+async def close_parser_processes():
+    """Stop the document parsing processes."""
+    close_parser_pool()
+
+@app.on_event("shutdown")
+async def flush_logs():
+    """Drain queued log records before the worker exits."""
+    log_listener.stop()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
@@ -39,7 +111,7 @@ async def health_check():
         "status": "healthy",
         "message": "RoleFit API is running",
         "version": "1.0.0",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": now_iso(),
         "openai_configured": bool(os.getenv("OPENAI_API_KEY"))
     }
 
@@ -53,59 +125,80 @@ async def read_root():
         "health": "/health",
         "endpoints": {
             "analyze": "/analyze",
+            "analyze_stream": "/analyze/stream",
+            "analyze_many": "/analyze/many",
+            "analyze_batch": "/analyze?mode=batch",
+            "batch_status": "/analyze/batch/{batch_id}",
             "upload_test": "/upload-test",
             "debug_extract": "/debug/extract-text"
         }
     }
 
-@app.post("/analyze")
-async def analyze_resume(
-    resume: UploadFile = File(...),
-    job_description: str = Form(...)
-):
+async def read_analyze_form(request: Request):
     """
-    Main endpoint for AI-powered resume analysis.
+    Stream and validate an analysis upload.
     
-    This is where the magic happens:
-    1. Validate inputs
-    2. Extract text from resume
-    3. Analyze with AI
-    4. Return structured results
+    Returns the resume upload, job description, file extension and size in MB.
     """
     
+    # Stream the upload (aborts with 413 once the size limit is exceeded)
+    form = await read_upload_form(request)
+    resume = form.get("resume")
+    job_description = form.get("job_description")
+    
     # Input validation
-    if not resume.filename:
+    if not isinstance(resume, UploadFile) or not resume.filename:
         raise HTTPException(status_code=400, detail="No resume file provided")
     
-    if not job_description.strip():
+    if not isinstance(job_description, str) or not job_description.strip():
         raise HTTPException(status_code=400, detail="Job description cannot be empty")
     
     # Validate file type
-    allowed_types = ['.pdf', '.docx', '.txt']
     file_extension = os.path.splitext(resume.filename)[1].lower()
     
-    if file_extension not in allowed_types:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported file type. Supported: {', '.join(allowed_types)}"
-        )
+    if file_extension not in ALLOWED_EXT:
+        raise HTTPException(status_code=400, detail=ALLOWED_EXT_MSG)
     
-    # Check file size (10MB limit)
-    file_content = await resume.read()
-    file_size_mb = len(file_content) / (1024 * 1024)
+    # Check file size (10MB limit) without re-reading the upload
+    file_size = get_upload_size(resume)
+    file_size_mb = file_size / (1024 * 1024)
     
-    if file_size_mb > 10:
+    if file_size > MAX_UPLOAD_BYTES:
         raise HTTPException(
-            status_code=400,
+            status_code=413,
             detail=f"File too large ({file_size_mb:.1f}MB). Maximum: 10MB"
         )
     
-    # Reset file pointer for processing
-    await resume.seek(0)
+    return resume, job_description, file_extension, file_size_mb
+
+@app.post("/analyze")
+async def analyze_resume(request: Request, analyzer: AIAnalyzer = Depends(get_ai_analyzer)):
+    """
+    Main endpoint for AI-powered resume analysis.
+    
+    Expects a multipart form with a `resume` file and a `job_description` field.
+    With `?mode=batch` the analysis is queued on the OpenAI Batch API instead
+    and a batch id is returned for polling `/analyze/batch/{batch_id}`.
+    
+    This is where the magic happens:
+    1. Validate inputs
+    2. Extract text from resume
+    3. Analyze with AI
+    4. Return structured results
+    """
+    
+    mode = request.query_params.get("mode", "interactive")
+    if mode not in ("interactive", "batch"):
+        raise HTTPException(status_code=400, detail="Unsupported mode. Supported: interactive, batch")
+    
+    resume, job_description, file_extension, file_size_mb = await read_analyze_form(request)
     
     try:
-        # Step 1: Extract text from resume
-        resume_text = await parse_resume_file(resume)
+        # Step 1: Extract text from resume while the job description is preprocessed
+        resume_text, jd_pre = await asyncio.gather(
+            parse_resume_file(resume),
+            preprocess_job_description(analyzer, job_description, embed=mode != "batch")
+        )
         
         if not resume_text.strip():
             raise HTTPException(
@@ -113,8 +206,14 @@ async def analyze_resume(
                 detail="No text could be extracted from the resume"
             )
         
+        # Non-interactive callers trade latency for half-price batch requests;
+        # invalid job descriptions are still answered immediately below
+        if mode == "batch" and jd_pre.is_meaningful:
+            batch = await submit_batch_analysis(analyzer, [(resume_text, job_description)])
+            return ORJSONResponse(status_code=202, content={"success": True, **batch})
+        
         # Step 2: Analyze with AI
-        analysis_result = await analyze_resume_with_ai(resume_text, job_description)
+        analysis_result = await analyze_resume_with_ai(analyzer, resume_text, job_description, jd_pre)
         
         # Step 3: Format response
         response_data = {
@@ -133,7 +232,7 @@ async def analyze_resume(
                 "file_type": file_extension,
                 "size_mb": round(file_size_mb, 2),
                 "text_length": len(resume_text),
-                "processed_at": datetime.now().isoformat()
+                "processed_at": now_iso()
             },
             "metadata": {
                 "api_version": "1.0.0",
@@ -141,46 +240,163 @@ async def analyze_resume(
             }
         }
         
-        return JSONResponse(content=response_data)
+        return ORJSONResponse(content=response_data, headers={"X-Cache": get_cache_status()})
         
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
     except Exception as e:
         # Log and handle unexpected errors
-        print(f"Analysis error: {str(e)}")
+        logger.exception("Analysis failed")
         raise HTTPException(
             status_code=500,
             detail=f"Analysis failed: {str(e)}"
         )
 
+@app.get("/analyze/batch/{batch_id}")
+async def get_batch_status(batch_id: str, analyzer: AIAnalyzer = Depends(get_ai_analyzer)):
+    """Poll a batch submitted with /analyze?mode=batch; includes results once completed."""
+    try:
+        return {"success": True, **await get_batch_analysis(analyzer, batch_id)}
+    except HTTPException:
+        raise
+    except NotFoundError:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    except Exception as e:
+        logger.exception("Batch lookup failed")
+        raise HTTPException(status_code=502, detail=f"Batch lookup failed: {str(e)}")
+
+@app.post("/analyze/many")
+async def analyze_many_resumes(request: Request, analyzer: AIAnalyzer = Depends(get_ai_analyzer)):
+    """
+    Rank several resumes against one job description.
+    
+    Expects a multipart form with one or more `resumes` files and a
+    `job_description` field (the 10MB upload limit applies to the whole
+    form). Resumes are parsed and analyzed concurrently; each one gets its
+    own success or error entry, in upload order.
+    """
+    
+    form = await read_upload_form(request)
+    resumes = [r for r in form.getlist("resumes") if isinstance(r, UploadFile) and r.filename]
+    job_description = form.get("job_description")
+    
+    if not resumes:
+        raise HTTPException(status_code=400, detail="No resume files provided")
+    
+    if len(resumes) > MAX_RESUMES_PER_REQUEST:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many resumes. Maximum: {MAX_RESUMES_PER_REQUEST}"
+        )
+    
+    if not isinstance(job_description, str) or not job_description.strip():
+        raise HTTPException(status_code=400, detail="Job description cannot be empty")
+    
+    for resume in resumes:
+        if os.path.splitext(resume.filename)[1].lower() not in ALLOWED_EXT:
+            raise HTTPException(status_code=400, detail=f"{resume.filename}: {ALLOWED_EXT_MSG}")
+    
+    texts = await asyncio.gather(*(parse_resume_file(r) for r in resumes), return_exceptions=True)
+    
+    # Only resumes with extracted text are sent for analysis
+    parsed = [i for i, text in enumerate(texts) if isinstance(text, str) and text.strip()]
+    try:
+        analyses = await analyze_many_with_ai(analyzer, [texts[i] for i in parsed], job_description)
+    except Exception as e:
+        logger.exception("Analysis failed")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+    analyses_by_index = dict(zip(parsed, analyses))
+    
+    results = []
+    for i, resume in enumerate(resumes):
+        entry = {"filename": resume.filename}
+        outcome = analyses_by_index.get(i, texts[i])
+        if isinstance(outcome, BaseException):
+            detail = outcome.detail if isinstance(outcome, HTTPException) else str(outcome)
+            logger.error("Analysis of %s failed: %s", resume.filename, detail)
+            entry.update(success=False, error=detail)
+        elif isinstance(outcome, str):
+            entry.update(success=False, error="No text could be extracted from the resume")
+        else:
+            entry.update(success=True, analysis=outcome.dict())
+        results.append(entry)
+    
+    return {
+        "success": True,
+        "results": results,
+        "metadata": {
+            "api_version": "1.0.0",
+            "processed_at": now_iso()
+        }
+    }
+
+@app.post("/analyze/stream")
+async def analyze_resume_stream(request: Request, analyzer: AIAnalyzer = Depends(get_ai_analyzer)):
+    """
+    Streaming variant of /analyze using Server-Sent Events.
+    
+    Sends `partial` events with raw JSON chunks as the model generates each
+    section, `item` events as each strength, improvement or keyword is
+    complete, then a final `result` event with the complete analysis.
+    """
+    
+    resume, job_description, file_extension, file_size_mb = await read_analyze_form(request)
+    
+    try:
+        resume_text, jd_pre = await asyncio.gather(
+            parse_resume_file(resume),
+            preprocess_job_description(analyzer, job_description)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Analysis failed")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+    
+    if not resume_text.strip():
+        raise HTTPException(
+            status_code=400,
+            detail="No text could be extracted from the resume"
+        )
+    
+    async def event_stream():
+        try:
+            async for event in stream_analysis_with_ai(analyzer, resume_text, job_description, jd_pre):
+                yield b"data: " + orjson.dumps(event) + b"\n\n"
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.exception("Streaming analysis failed")
+            yield b"data: " + orjson.dumps({"type": "error", "detail": f"Analysis failed: {str(e)}"}) + b"\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.post("/upload-test")
-async def upload_file_test(file: UploadFile = File(...)):
+async def upload_file_test(request: Request):
     """Test endpoint for file upload and text extraction."""
     
+    form = await read_upload_form(request)
+    file = form.get("file")
+    
+    if not isinstance(file, UploadFile) or not file.filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+    
     # Validate file type
-    allowed_types = ['.pdf', '.docx', '.txt']
     file_extension = os.path.splitext(file.filename)[1].lower()
     
-    if file_extension not in allowed_types:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported file type '{file_extension}'. Allowed: {', '.join(allowed_types)}"
-        )
+    if file_extension not in ALLOWED_EXT:
+        raise HTTPException(status_code=400, detail=ALLOWED_EXT_MSG)
     
     # Validate file size
-    file_content = await file.read()
-    file_size_mb = len(file_content) / (1024 * 1024)
+    file_size = get_upload_size(file)
+    file_size_mb = file_size / (1024 * 1024)
     
-    if file_size_mb > 10:
+    if file_size > MAX_UPLOAD_BYTES:
         raise HTTPException(
-            status_code=400,
+            status_code=413,
             detail=f"File too large ({file_size_mb:.1f}MB). Maximum: 10MB"
         )
     
-    # Reset file pointer
-    await file.seek(0)
-    
     try:
         # Extract text
         extracted_text = await parse_resume_file(file)
@@ -204,8 +420,17 @@ async def upload_file_test(file: UploadFile = File(...)):
         )
 
 @app.post("/debug/extract-text")
-async def debug_extract_text(file: UploadFile = File(...)):
+async def debug_extract_text(request: Request):
     """Debug endpoint to see full extracted text."""
+    form = await read_upload_form(request)
+    file = form.get("file")
+    
+    if not isinstance(file, UploadFile) or not file.filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+    
+    if os.path.splitext(file.filename)[1].lower() not in ALLOWED_EXT:
+        raise HTTPException(status_code=400, detail=ALLOWED_EXT_MSG)
+    
     try:
         text = await parse_resume_file(file)
         return {
@@ -224,7 +449,23 @@ async def debug_config():
     return {
         "openai_configured": bool(os.getenv("OPENAI_API_KEY")),
         "api_key_length": len(os.getenv("OPENAI_API_KEY", "")) if os.getenv("OPENAI_API_KEY") else 0,
-        "default_model": os.getenv("DEFAULT_MODEL", "gpt-3.5-turbo"),
+        "default_model": os.getenv("DEFAULT_MODEL", "gpt-4o-mini"),
         "debug_mode": os.getenv("DEBUG_MODE", "False"),
         "environment_loaded": True
-    }
\ No newline at end of file
+    }
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # "auto" picks uvloop + httptools when installed (uvloop has no Windows
+    # build) and falls back to asyncio + h11; the app is I/O-bound.
+    # Each worker is a separate process with its own AIAnalyzer and OpenAI
+    # connection pool, so pools start cold whenever a worker (re)starts.
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="auto",
+        http="auto",
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+    )
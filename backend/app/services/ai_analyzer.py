@@ -1,27 +1,404 @@
 # app/services/ai_analyzer.py - Enhanced Validation Version
 
 import os
-import json
+import orjson
 import asyncio
-from typing import Dict, List, Optional
+import functools
+import hashlib
+import math
+import threading
+from collections import Counter, OrderedDict
+from itertools import chain
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 from openai import AsyncOpenAI
 from pydantic import BaseModel
-from fastapi import HTTPException
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
 import logging
 import re
+import httpx
+import ijson
+import tiktoken
+import ahocorasick
+import numpy as np
+from aiolimiter import AsyncLimiter
+
+from app.services.analysis_cache import AnalysisCache, SemanticCache, make_cache_key, make_resume_key
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Cache outcome of the current request ("HIT" or "MISS"), read by the API layer
+_cache_status: ContextVar[str] = ContextVar("cache_status", default="MISS")
+
+# Shared by every analysis call and kept byte-identical so it forms a
+# cacheable prompt prefix; the task-specific instructions come last.
+SYSTEM_PROMPT = """You are an expert ATS analyst. Your job is to compare the resume against the SPECIFIC job description provided.
+
+CRITICAL INSTRUCTIONS:
+1. ONLY analyze if the job description appears to be a real job posting
+2. If the job description contains Lorem Ipsum, placeholder text, or dummy content, respond with an error
+3. Extract specific skills, technologies, and requirements ONLY from the actual job description
+4. Do NOT add general industry knowledge or assume requirements
+5. Be literal and precise in your keyword matching
+
+You must respond with a JSON object containing ONLY the fields requested in the final message."""
+
+# User message templates for the documents, filled with % formatting
+_RESUME_TEMPLATE = "RESUME TEXT:\n%s"
+_JOB_DESCRIPTION_TEMPLATE = "JOB DESCRIPTION:\n%s"
+
+KEYWORDS_INSTRUCTIONS = """Compare the keywords of this resume against the specific job description. Only extract keywords and requirements that are explicitly mentioned in the job description above.
+
+Respond with JSON only, containing:
+- missing_keywords: Array of terms from job description not found in resume
+- keyword_matches: Array of terms found in both resume and job description"""
+
+QUALITATIVE_INSTRUCTIONS = """Review this resume against the specific job description above. The resume lines are numbered.
+
+Respond with JSON only, containing:
+- strengths: Array of objects {"lines": [first, last], "label": "short phrase"} pointing at the numbered resume lines that show a specific strength relative to job description. Do NOT copy resume text.
+- improvements: Array of short, specific improvements needed for this job
+- overall_feedback: Brief summary based on actual comparison"""
+
+SCORE_INSTRUCTIONS = """Score how well this resume matches the specific job description above.
+
+Respond with JSON only, containing:
+- ats_score: Integer 0-100 based on actual job requirements match
+- confidence_score: Float 0.0-1.0
+
+If job description appears to be placeholder/dummy text, return ats_score: 0."""
+
+# Structured-output schemas, one per analysis call; the model is constrained
+# to exactly these fields, so it can't spend tokens on anything else
+def _json_schema(name: str, properties: Dict) -> Dict:
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": properties,
+                "required": list(properties),
+                "additionalProperties": False
+            }
+        }
+    }
+
+def _string_array(max_items: int) -> Dict:
+    return {"type": "array", "items": {"type": "string"}, "maxItems": max_items}
+
+# Bounds are enforced by structured outputs, so responses need no clamping
+KEYWORDS_SCHEMA = _json_schema("keyword_analysis", {
+    "missing_keywords": _string_array(10),
+    "keyword_matches": _string_array(10)
+})
+
+QUALITATIVE_SCHEMA = _json_schema("qualitative_analysis", {
+    "strengths": {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "lines": {
+                    "type": "array",
+                    "items": {"type": "integer", "minimum": 0},
+                    "minItems": 2,
+                    "maxItems": 2
+                },
+                "label": {"type": "string"}
+            },
+            "required": ["lines", "label"],
+            "additionalProperties": False
+        },
+        "maxItems": 5
+    },
+    "improvements": _string_array(5),
+    "overall_feedback": {"type": "string"}
+})
+
+SCORE_SCHEMA = _json_schema("score_analysis", {
+    "ats_score": {"type": "integer", "minimum": 0, "maximum": 100},
+    "confidence_score": {"type": "number", "minimum": 0, "maximum": 1}
+})
+
+# Per-section (instructions, response format, max tokens) for the analysis calls
+ANALYSIS_SECTIONS = {
+    "keywords": (KEYWORDS_INSTRUCTIONS, KEYWORDS_SCHEMA, 400),
+    "qualitative": (QUALITATIVE_INSTRUCTIONS, QUALITATIVE_SCHEMA, 400),
+    "score": (SCORE_INSTRUCTIONS, SCORE_SCHEMA, 50)
+}
+
+# Batch metadata tag; batch ids without it belong to someone else in the OpenAI account
+BATCH_SOURCE = "rolefit"
+
+# Splits resume text into addressable lines; PDF text arrives as one long
+# line, so sentence ends and bullet characters also start a new line.
+_LINE_SPLIT_RE = re.compile(r"\s*\n\s*|(?<=[.!?])\s+|\s*[•▪●]\s*")
+
+# Number of job description validation results kept per analyzer
+MEANINGFUL_CACHE_SIZE = 4096
+
+# Token budgets for the documents sent to the model
+RESUME_TOKEN_BUDGET = 1500
+JOB_DESCRIPTION_TOKEN_BUDGET = 1000
+
+# Characters per token assumed when no tiktoken encoding is available
+CHARS_PER_TOKEN_FALLBACK = 2
+
+# Only this many characters per budgeted token are handed to the tokenizer;
+# English prose averages about four, so the window comfortably covers the budget
+TOKENIZER_CHARS_PER_TOKEN = 8
+
+# Words ignored by the TF-IDF relevance gate
+_STOP_WORDS = frozenset({
+    "a", "about", "above", "after", "again", "all", "also", "am", "an", "and",
+    "any", "are", "as", "at", "be", "been", "before", "being", "below", "between",
+    "both", "but", "by", "can", "could", "did", "do", "does", "doing", "down",
+    "during", "each", "etc", "few", "for", "from", "further", "had", "has", "have",
+    "having", "he", "her", "here", "hers", "him", "his", "how", "i", "if", "in",
+    "into", "is", "it", "its", "just", "may", "me", "more", "most", "must", "my",
+    "no", "nor", "not", "of", "off", "on", "once", "only", "or", "other", "our",
+    "ours", "out", "over", "own", "same", "she", "should", "so", "some", "such",
+    "than", "that", "the", "their", "them", "then", "there", "these", "they",
+    "this", "those", "through", "to", "too", "under", "until", "up", "us", "very",
+    "was", "we", "were", "what", "when", "where", "which", "while", "who", "whom",
+    "why", "will", "with", "within", "would", "you", "your", "yours"
+})
+_TFIDF_TOKEN_RE = re.compile(r"\b\w\w+\b")
+
+# Smoothed idf of a term found in only one of the two documents (a term in
+# both has idf 1), matching scikit-learn's TfidfVectorizer defaults
+_SINGLE_DOC_IDF = 1.0 + math.log(1.5)
+
+def _term_counts(lowered: str) -> Counter:
+    """Term frequencies of lowercased text, without stop words."""
+    return Counter(t for t in _TFIDF_TOKEN_RE.findall(lowered) if t not in _STOP_WORDS)
+
+def _tfidf_cosine(a: Counter, b: Counter) -> float:
+    """
+    Cosine similarity of two documents' TF-IDF vectors.
+    
+    With only two documents the idf takes two values, so the vectors never
+    need to be materialized: shared terms form the dot product and every
+    term contributes its weight to its own document's norm.
+    """
+    def norm(counts: Counter, other: Counter) -> float:
+        return math.sqrt(sum(
+            (n if t in other else n * _SINGLE_DOC_IDF) ** 2 for t, n in counts.items()
+        ))
+    
+    norms = norm(a, b) * norm(b, a)
+    if not norms:
+        return 0.0
+    
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(n * b[t] for t, n in a.items() if t in b) / norms
+
+# Responses larger than this are decoded in the thread pool
+LARGE_JSON_BYTES = 8 * 1024
+
+# Technical keywords used by the local fallback analyzer
+TECH_KEYWORDS = frozenset({
+    'python', 'java', 'javascript', 'typescript', 'c++', 'c#', 'golang', 'rust',
+    'scala', 'kotlin', 'swift', 'ruby', 'php', 'html', 'css', 'sql', 'nosql',
+    'react', 'angular', 'vue', 'node.js', 'next.js', 'django', 'flask', 'fastapi',
+    'spring', 'graphql', 'postgresql', 'mysql', 'mongodb', 'redis', 'kafka',
+    'spark', 'hadoop', 'airflow', 'pandas', 'numpy', 'tensorflow', 'pytorch',
+    'aws', 'azure', 'gcp', 'docker', 'kubernetes', 'terraform', 'linux', 'git',
+    'ci/cd', 'jenkins', 'agile', 'scrum', 'jira', 'tableau', 'excel'
+})
+
+# Multi-word keywords can't come out of the tokenizer, so they are matched as phrases
+TECH_PHRASES = (
+    'machine learning', 'deep learning', 'data analysis', 'data engineering',
+    'natural language processing', 'computer vision', 'project management',
+    'unit testing', 'continuous integration', 'react native', 'spring boot',
+    'power bi', 'google cloud', 'rest api'
+)
+
+# Lowercase word tokens, keeping symbols that belong to tech names (c++, node.js, ci/cd)
+TOKEN_RE = re.compile(r"[a-z][a-z0-9+#]*(?:[./-][a-z0-9+#]+)*")
+
+# Phrase lists used by _is_meaningful_job_description
+LOREM_IPSUM_INDICATORS = (
+    'lorem ipsum', 'dolor sit amet', 'consectetur adipiscing',
+    'sed do eiusmod', 'tempor incididunt', 'labore et dolore',
+    'magna aliqua', 'enim ad minim', 'veniam quis nostrud',
+    'exercitation ullamco', 'laboris nisi', 'aliquip ex ea',
+    'commodo consequat', 'duis aute irure', 'reprehenderit in voluptate',
+    'esse cillum', 'fugiat nulla pariatur', 'excepteur sint occaecat',
+    'cupidatat non proident', 'sunt in culpa'
+)
+
+DUMMY_TEXT_PATTERNS = (
+    'dummy text', 'placeholder text', 'sample text',
+    'test content', 'filler text', 'example text',
+    'typesetting industry', 'printing industry',
+    'galley of type', 'type specimen book',
+    'letraset sheets', 'aldus pagemaker',
+    'desktop publishing software'
+)
+
+JOB_INDICATORS = (
+    # Core job terms
+    'experience', 'required', 'responsibilities', 'qualifications', 'skills',
+    'role', 'position', 'candidate', 'team', 'work', 'job',
+    
+    # Action words
+    'develop', 'manage', 'support', 'create', 'build', 'design',
+    'implement', 'maintain', 'collaborate', 'lead', 'analyze',
+    
+    # Technical terms
+    'technical', 'development', 'engineering', 'programming',
+    'software', 'application', 'system', 'technology', 'tools',
+    
+    # Business terms
+    'business', 'project', 'client', 'customer', 'product',
+    'service', 'solutions', 'requirements', 'processes',
+    
+    # Qualification terms
+    'degree', 'education', 'certification', 'training',
+    'knowledge', 'ability', 'expertise', 'proficiency'
+)
+
+PROFESSIONAL_TERMS = (
+    'company', 'organization', 'department', 'office',
+    'salary', 'benefits', 'remote', 'onsite', 'hybrid',
+    'full-time', 'part-time', 'contract', 'permanent'
+)
+
+SPECIFIC_TERMS = (
+    'python', 'java', 'javascript', 'react', 'angular', 'vue',
+    'sql', 'database', 'api', 'aws', 'azure', 'docker',
+    'git', 'agile', 'scrum', 'testing', 'debugging',
+    'bachelor', 'master', 'degree', 'years of experience',
+    'minimum', 'preferred', 'must have', 'should have'
+)
+
+# Category order matches the tuple returned by _count_indicator_phrases
+_INDICATOR_CATEGORIES = (
+    LOREM_IPSUM_INDICATORS, DUMMY_TEXT_PATTERNS, JOB_INDICATORS,
+    PROFESSIONAL_TERMS, SPECIFIC_TERMS
+)
+
+def _build_indicator_automaton() -> ahocorasick.Automaton:
+    """
+    Compile every indicator phrase into one Aho-Corasick automaton.
+    
+    A phrase may belong to several categories ('degree' is both a job
+    indicator and a specific term), so each word maps to all of them.
+    """
+    categories_by_phrase: Dict[str, List[int]] = {}
+    for category, phrases in enumerate(_INDICATOR_CATEGORIES):
+        for phrase in phrases:
+            categories_by_phrase.setdefault(phrase, []).append(category)
+    
+    automaton = ahocorasick.Automaton()
+    for phrase, categories in categories_by_phrase.items():
+        automaton.add_word(phrase, (phrase, tuple(categories)))
+    automaton.make_automaton()
+    return automaton
+
+# Built once at import and shared by every request
+_INDICATOR_AUTOMATON = _build_indicator_automaton()
+
+# Whole whitespace-delimited words that look typed at random: keyboard rows
+# (scored 5 each) or 5+ characters built from at most two distinct characters.
+# The (?!\2) keeps the second character distinct from the first; otherwise
+# both alternatives of (?:\2|\3) match the same text and a failed match
+# backtracks exponentially.
+_RANDOM_RE = re.compile(
+    r"(?<!\S)(?:(?P<keyboard>asdf|qwerty|zxcv|asdfgh|qwertyui)"
+    r"|(?=\S{5})(\S)\2*(?:(?!\2)(\S)(?:\2|\3)*)?)(?!\S)"
+)
+
+def _count_indicator_phrases(cleaned: str) -> Tuple[int, ...]:
+    """
+    Count distinct indicator phrases per category in one pass over the text.
+    
+    Matches the old `sum(1 for p in LIST if p in cleaned)` semantics: each
+    phrase counts once no matter how often (or overlapping) it occurs. The
+    distinct hits are collected into a set, then tallied by one Counter.update.
+    """
+    matched = {value for _, value in _INDICATOR_AUTOMATON.iter(cleaned)}
+    counts = Counter()
+    counts.update(chain.from_iterable(categories for _, categories in matched))
+    return tuple(counts[category] for category in range(len(_INDICATOR_CATEGORIES)))
+
 class AnalysisResult(BaseModel):
-    ats_score: int
-    strengths: List[str]
-    improvements: List[str]
-    missing_keywords: List[str]
-    keyword_matches: List[str]
-    overall_feedback: str
-    confidence_score: float
+    """
+    Validated analysis returned to clients.
+    
+    Score ranges and list lengths are enforced by the response schemas,
+    so model output can be passed straight to AnalysisResult.parse_obj.
+    """
+    ats_score: int = 0
+    strengths: List[str] = []
+    improvements: List[str] = []
+    missing_keywords: List[str] = []
+    keyword_matches: List[str] = []
+    overall_feedback: str = "Analysis completed"
+    confidence_score: float = 0.0
+
+@dataclass(frozen=True)
+class PreprocessedJobDescription:
+    """Resume-independent work on a job description, done once per request."""
+    is_meaningful: bool
+    truncated: str
+    tech_keywords: frozenset
+    term_counts: Counter
+    embedding: Optional[np.ndarray] = None
+
+class _ItemStream:
+    """
+    Incrementally parse one section's streamed JSON, collecting array items.
+    
+    Learning Concept: Incremental Parsing
+    - A push parser consumes the completion chunk by chunk as it arrives
+    - Each array element is available as soon as its closing token
+      streams in, long before the whole JSON object is complete
+    """
+    
+    def __init__(self, fields: Tuple[str, ...]):
+        self._parsers = []
+        for field in fields:
+            found = ijson.sendable_list()
+            self._parsers.append((field, found, ijson.items_coro(found, f"{field}.item", use_float=True)))
+    
+    def feed(self, delta: str) -> List[Tuple[str, object]]:
+        """Parse a chunk and return the (field, item) pairs it completed."""
+        data = delta.encode("utf-8")
+        items = []
+        try:
+            for field, found, parser in self._parsers:
+                parser.send(data)
+                items.extend((field, item) for item in found)
+                del found[:]
+        except ijson.JSONError as e:
+            # Items are a preview; the final parse reports real errors
+            logger.warning("Stopped incremental parsing: %s", e)
+            self._parsers = []
+        return items
+
+# Array fields streamed item by item, per analysis section
+STREAMED_ITEM_FIELDS = {
+    "keywords": ("missing_keywords", "keyword_matches"),
+    "qualitative": ("strengths", "improvements")
+}
+
+@dataclass
+class _PreparedAnalysis:
+    """Inputs for an AI call that missed every cache."""
+    resume_text: str
+    job_description: str
+    cache_key: str
+    resume_key: str
+    embedding: Optional[np.ndarray]
+    jd_pre: PreprocessedJobDescription
 
 class AIAnalyzer:
     def __init__(self):
@@ -29,11 +406,385 @@ class AIAnalyzer:
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable not set")
         
-        self.client = AsyncOpenAI(api_key=api_key)
-        self.model = os.getenv("DEFAULT_MODEL", "gpt-3.5-turbo")
-        self.max_tokens = 2000
+        # Explicit connection pool so concurrent /analyze calls reuse TCP/TLS
+        # connections. Built once per process: never construct an AIAnalyzer
+        # per request, or every call pays a fresh TLS handshake.
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "200")),
+                max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "100")),
+                keepalive_expiry=60
+            ),
+            timeout=httpx.Timeout(30.0, connect=5.0)
+        )
+        self.client = AsyncOpenAI(api_key=api_key, http_client=self.http_client, max_retries=2)
+        self.model = os.getenv("DEFAULT_MODEL", "gpt-4o-mini")
+        self.max_tokens = int(os.getenv("MAX_TOKENS", 600))
+        self.temperature = 0.1  # Very low temperature for precise analysis
+        self.encoding = self._load_encoding(self.model)
+        
+        # Token bucket shared by every OpenAI request from this process, so
+        # fan-out (analyze_many) stays inside the account's requests/minute
+        self.rate_limiter = AsyncLimiter(int(os.getenv("OPENAI_RPM", "500")), 60)
+        self.fanout_limit = int(os.getenv("ANALYZE_CONCURRENCY", "20"))
         
-    async def analyze_resume(self, resume_text: str, job_description: str) -> AnalysisResult:
+        # Exact-match cache of AI results keyed on the normalized inputs
+        self.cache = AnalysisCache(
+            max_entries=int(os.getenv("ANALYSIS_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.getenv("ANALYSIS_CACHE_TTL", "3600"))
+        )
+        
+        # Embedding cache for paraphrased job descriptions of the same resume
+        # (exact-cache misses); only persisted when SEMANTIC_CACHE_DB is set
+        self.embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+        semantic_cache_enabled = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+        self.semantic_cache = SemanticCache(
+            model=f"{self.model}|{self.embedding_model}",
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+            max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "10000")),
+            ttl_seconds=float(os.getenv("SEMANTIC_CACHE_TTL", "86400")),
+            db_path=os.getenv("SEMANTIC_CACHE_DB") or None
+        ) if semantic_cache_enabled else None
+        
+        # Validator results by job description digest (called from worker threads)
+        self._meaningful_cache: "OrderedDict[bytes, bool]" = OrderedDict()
+        self._meaningful_lock = threading.Lock()
+        
+        # Job description validators by source: verified job descriptions
+        # (trusted=True) skip the dummy-text scan entirely
+        self._jd_validators = {
+            False: self._is_meaningful_job_description,
+            True: self._trust_job_description
+        }
+        
+        # Resume/job description pairs less similar than this skip the AI call
+        self.min_relevance = float(os.getenv("MIN_RELEVANCE_SIMILARITY", "0.02"))
+        
+        # Identical requests already being analyzed, keyed by cache key
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._inflight_lock = asyncio.Lock()
+        
+    async def aclose(self) -> None:
+        """Close the pooled HTTP connections."""
+        await self.http_client.aclose()
+    
+    async def warm_up(self) -> None:
+        """
+        Open a pooled connection to OpenAI before the first request needs it.
+        
+        DNS lookup and the TCP/TLS handshake happen at startup instead of on
+        a user's request; a failure here only costs that head start.
+        """
+        try:
+            await self.client.models.list()
+            logger.info("OpenAI connection warmed up")
+        except Exception as e:
+            logger.warning("OpenAI warm-up request failed: %s", e)
+    
+    async def analyze_resume(
+        self,
+        resume_text: str,
+        job_description: str,
+        jd_pre: Optional[PreprocessedJobDescription] = None,
+        trusted: bool = False
+    ) -> AnalysisResult:
+        """
+        Analyze a resume against a job description.
+        
+        trusted marks a job description from a verified source (not user
+        input), which skips the placeholder/dummy-text validation.
+        """
+        prepared = await self._prepare_analysis(resume_text, job_description, jd_pre, trusted)
+        if isinstance(prepared, AnalysisResult):
+            return prepared
+        
+        return await self._coalesce(prepared.cache_key, lambda: self._run_analysis(prepared))
+    
+    async def analyze_many(
+        self,
+        resumes: List[str],
+        job_description: str,
+        trusted: bool = False
+    ) -> List[Union[AnalysisResult, BaseException]]:
+        """
+        Analyze several resumes against one job description concurrently.
+        
+        Backend Engineering Concept: Bounded Fan-out
+        - asyncio.gather issues every analysis at once instead of one by one
+        - A semaphore caps how many run at the same time, and the shared
+          rate limiter keeps the total under OpenAI's requests per minute
+        - The job description is validated and preprocessed only once
+        
+        Results are returned in input order; a failed analysis is returned
+        as its exception instead of failing the whole batch.
+        """
+        jd_pre = await self.prepare_job_description(job_description, trusted)
+        semaphore = asyncio.Semaphore(self.fanout_limit)
+        
+        async def analyze_one(resume_text: str) -> AnalysisResult:
+            async with semaphore:
+                return await self.analyze_resume(resume_text, job_description, jd_pre)
+        
+        return await asyncio.gather(*(analyze_one(r) for r in resumes), return_exceptions=True)
+    
+    async def _run_analysis(self, prepared: "_PreparedAnalysis") -> Tuple[AnalysisResult, bool]:
+        """Run the AI analysis; the flag is False when the local fallback was returned instead."""
+        try:
+            # Generate analysis using AI
+            logger.info("Calling OpenAI API for analysis")
+            analysis_data = await self._generate_analysis(prepared.resume_text, prepared.job_description)
+            return await self._finalize_analysis(prepared, analysis_data), True
+            
+        except Exception as e:
+            logger.error("AI analysis failed: %s", e)
+            fallback = await run_in_threadpool(
+                self._generate_fallback_analysis, prepared.resume_text, prepared.jd_pre
+            )
+            return fallback, False
+    
+    async def _coalesce(
+        self,
+        key: str,
+        run: Callable[[], Awaitable[Tuple[AnalysisResult, bool]]]
+    ) -> AnalysisResult:
+        """
+        Share one upstream analysis between identical concurrent requests.
+        
+        Backend Engineering Concept: Request Coalescing
+        - The first request for a key starts the analysis as its own task
+        - Identical requests arriving meanwhile await that task instead of
+          making their own OpenAI calls
+        - Every request awaits it through a shield, so a client that
+          disconnects (owner or joiner) never cancels the shared call
+        - Joiners report a cache HIT only if the shared call reached the AI;
+          a fallback result is passed along but not presented as a hit
+        """
+        async with self._inflight_lock:
+            task = self._inflight.get(key)
+            is_owner = task is None
+            if is_owner:
+                task = asyncio.ensure_future(run())
+                self._inflight[key] = task
+                task.add_done_callback(functools.partial(self._forget_inflight, key))
+        
+        if not is_owner:
+            logger.info("Joining in-flight analysis")
+        
+        result, from_ai = await asyncio.shield(task)
+        if from_ai and not is_owner:
+            _cache_status.set("HIT")
+        return result
+    
+    def _forget_inflight(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark a failure as retrieved even if every waiter has gone away
+        if not task.cancelled():
+            task.exception()
+    
+    async def stream_analysis(
+        self,
+        resume_text: str,
+        job_description: str,
+        jd_pre: Optional[PreprocessedJobDescription] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Yield analysis events while the OpenAI completions stream in.
+        
+        Emits {"type": "partial", "section": ..., "delta": ...} for each chunk
+        of generated JSON, {"type": "item", "section": ..., "field": ...,
+        "item": ...} as each list entry completes, then one
+        {"type": "result", "analysis": ...} event with the final validated
+        analysis.
+        """
+        prepared = await self._prepare_analysis(resume_text, job_description, jd_pre)
+        if isinstance(prepared, AnalysisResult):
+            yield {"type": "result", "cache": _cache_status.get(), "analysis": prepared.dict()}
+            return
+        
+        events: asyncio.Queue = asyncio.Queue()
+        item_streams = {section: _ItemStream(fields) for section, fields in STREAMED_ITEM_FIELDS.items()}
+        resume_lines = self._split_lines(prepared.resume_text)
+        
+        def on_delta(section: str, delta: str) -> None:
+            events.put_nowait({"type": "partial", "section": section, "delta": delta})
+            
+            item_stream = item_streams.get(section)
+            if item_stream is None:
+                return
+            for field, item in item_stream.feed(delta):
+                if field == "strengths":
+                    resolved = self._resolve_line_pointers([item], resume_lines)
+                    if not resolved:
+                        continue
+                    item = resolved[0]
+                events.put_nowait({"type": "item", "section": section, "field": field, "item": item})
+        
+        logger.info("Streaming OpenAI analysis")
+        task = asyncio.create_task(
+            self._generate_analysis(prepared.resume_text, prepared.job_description, on_delta=on_delta)
+        )
+        task.add_done_callback(lambda _: events.put_nowait(None))
+        
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            # Client went away mid-stream: stop paying for the completions
+            if not task.done():
+                task.cancel()
+        
+        try:
+            result = await self._finalize_analysis(prepared, task.result())
+        except Exception as e:
+            logger.error("AI analysis failed: %s", e)
+            result = await run_in_threadpool(
+                self._generate_fallback_analysis, prepared.resume_text, prepared.jd_pre
+            )
+        
+        yield {"type": "result", "cache": _cache_status.get(), "analysis": result.dict()}
+    
+    async def submit_batch(self, jobs: List[Tuple[str, str]]) -> Dict:
+        """
+        Queue (resume_text, job_description) pairs on the OpenAI Batch API.
+        
+        Backend Engineering Concept: Offline Batch Processing
+        - Non-interactive work doesn't need an answer within seconds
+        - Batch requests are billed at half price and don't count against
+          the realtime rate limits, in exchange for a 24h completion window
+        
+        Every job becomes one request per analysis section; the custom_id
+        ("<job index>:<section>") lets get_batch_results reassemble them.
+        """
+        lines = []
+        for index, (resume_text, job_description) in enumerate(jobs):
+            _, numbered_resume = self._number_lines(self._truncate_text(resume_text, RESUME_TOKEN_BUDGET))
+            truncated_jd = self._truncate_text(job_description, JOB_DESCRIPTION_TOKEN_BUDGET)
+            for section, (instructions, response_format, max_tokens) in ANALYSIS_SECTIONS.items():
+                lines.append(orjson.dumps({
+                    "custom_id": f"{index}:{section}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": self._completion_params(
+                        numbered_resume, truncated_jd, instructions, response_format, max_tokens
+                    )
+                }))
+        
+        batch_file = await self.client.files.create(
+            file=("analysis_batch.jsonl", b"\n".join(lines)),
+            purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+            metadata={"source": BATCH_SOURCE, "jobs": str(len(jobs))}
+        )
+        logger.info("Submitted batch %s with %d analyses", batch.id, len(jobs))
+        return {"batch_id": batch.id, "status": batch.status}
+    
+    async def get_batch_results(self, batch_id: str) -> Dict:
+        """
+        Return the status of a batch and, once completed, its analyses.
+        
+        The resume text isn't kept server-side, so strength pointers are
+        resolved to their labels only. Batches this service didn't submit
+        are reported as not found, even if they exist in the OpenAI account.
+        """
+        batch = await self.client.batches.retrieve(batch_id)
+        if (batch.metadata or {}).get("source") != BATCH_SOURCE:
+            raise HTTPException(status_code=404, detail="Batch not found")
+        if batch.status != "completed" or not batch.output_file_id:
+            return {"batch_id": batch_id, "status": batch.status}
+        
+        content = await self.client.files.content(batch.output_file_id)
+        sections: Dict[int, Dict[str, Dict]] = {}
+        for line in content.content.splitlines():
+            if not line.strip():
+                continue
+            record = orjson.loads(line)
+            index, section = record["custom_id"].split(":", 1)
+            response = record.get("response") or {}
+            if response.get("status_code") != 200:
+                continue
+            try:
+                message = response["body"]["choices"][0]["message"]["content"]
+                sections.setdefault(int(index), {})[section] = orjson.loads(message)
+            except (KeyError, IndexError, orjson.JSONDecodeError) as e:
+                logger.error("Unreadable batch output for %s: %s", record["custom_id"], e)
+        
+        # Jobs whose requests all failed have no output lines at all
+        job_count = int((batch.metadata or {}).get("jobs", 0)) or max(sections, default=-1) + 1
+        
+        results = []
+        for index in range(job_count):
+            job = sections.get(index, {})
+            if len(job) != len(ANALYSIS_SECTIONS):
+                results.append({"index": index, "success": False, "error": "Incomplete analysis"})
+                continue
+            
+            qualitative = job["qualitative"]
+            qualitative["strengths"] = self._resolve_line_pointers(qualitative.get("strengths", []), [])
+            analysis = self._parse_analysis_response(
+                self._merge_sections(job["keywords"], qualitative, job["score"])
+            )
+            results.append({"index": index, "success": True, "analysis": analysis.dict()})
+        
+        return {"batch_id": batch_id, "status": batch.status, "results": results}
+    
+    def preprocess_job_description(self, job_description: str, trusted: bool = False) -> PreprocessedJobDescription:
+        """
+        Validate, truncate and keyword-scan a job description.
+        
+        None of this depends on the resume, so the API layer can run it
+        while the resume file is still being parsed. Trusted job
+        descriptions are not validated.
+        """
+        is_meaningful, cleaned = self._jd_validators[trusted](job_description)
+        
+        # Truncate once; the keyword scan runs over the same window, lowercased
+        truncated = self._truncate_text(job_description, JOB_DESCRIPTION_TOKEN_BUDGET)
+        return PreprocessedJobDescription(
+            is_meaningful=is_meaningful,
+            truncated=truncated,
+            tech_keywords=self._scan_tech_keywords(truncated.lower()),
+            term_counts=_term_counts(cleaned)
+        )
+    
+    async def prepare_job_description(
+        self,
+        job_description: str,
+        trusted: bool = False,
+        embed: bool = True
+    ) -> PreprocessedJobDescription:
+        """
+        Preprocess a job description in the thread pool, then embed it for the semantic cache.
+        
+        The embedding depends only on the job description, so when this runs
+        alongside resume parsing its OpenAI round-trip is off the critical path.
+        Job descriptions that fail validation are never embedded.
+        """
+        jd_pre = await run_in_threadpool(self.preprocess_job_description, job_description, trusted)
+        if embed and jd_pre.is_meaningful:
+            jd_pre = replace(jd_pre, embedding=await self._embed_for_cache(job_description))
+        return jd_pre
+    
+    async def _prepare_analysis(
+        self,
+        resume_text: str,
+        job_description: str,
+        jd_pre: Optional[PreprocessedJobDescription] = None,
+        trusted: bool = False
+    ) -> Union[AnalysisResult, "_PreparedAnalysis"]:
+        """
+        Validate inputs and consult the caches.
+        
+        Returns a finished AnalysisResult when no AI call is needed, otherwise
+        the truncated inputs plus the keys needed to cache the eventual result.
+        """
         # Input validation
         if not resume_text.strip():
             raise HTTPException(status_code=400, detail="Resume text is empty")
@@ -41,79 +792,149 @@ class AIAnalyzer:
         if not job_description.strip():
             raise HTTPException(status_code=400, detail="Job description is empty")
         
+        # Serve repeated (resume, job description) pairs from cache
+        _cache_status.set("MISS")
+        cache_key = make_cache_key(resume_text, job_description, self.model, self.temperature)
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            logger.info("Analysis cache hit")
+            _cache_status.set("HIT")
+            return cached
+        
         # Debug logging
-        logger.info(f"Resume length: {len(resume_text)} characters")
-        logger.info(f"Job description length: {len(job_description)} characters")
-        logger.info(f"Job description preview: {job_description[:100]}...")
+        logger.info("Resume length: %d characters", len(resume_text))
+        logger.info("Job description length: %d characters", len(job_description))
+        logger.info("Job description preview: %.100s...", job_description)
         
-        # Enhanced validation with dummy text detection
-        is_meaningful = self._is_meaningful_job_description(job_description)
-        logger.info(f"Job description is meaningful: {is_meaningful}")
+        # Enhanced validation with dummy text detection (unless already done)
+        if jd_pre is None:
+            jd_pre = await self.prepare_job_description(job_description, trusted)
+        is_meaningful = jd_pre.is_meaningful
+        logger.info("Job description is meaningful: %s", is_meaningful)
         
         if not is_meaningful:
             logger.info("Returning no-job-description analysis")
             return self._generate_no_job_description_analysis(resume_text)
         
-        # Truncate inputs if too long
-        resume_text = self._truncate_text(resume_text, 3000)
-        job_description = self._truncate_text(job_description, 2000)
+        # Truncate once: the relevance gate scores the same window the model sees,
+        # so a huge resume is never tokenized in full on the event loop
+        truncated_resume = self._truncate_text(resume_text, RESUME_TOKEN_BUDGET)
+        
+        # Cheap local relevance gate: clearly unrelated pairs never reach OpenAI
+        similarity = _tfidf_cosine(_term_counts(truncated_resume.lower()), jd_pre.term_counts)
+        logger.info("Resume/job description TF-IDF similarity: %.3f", similarity)
+        
+        if similarity < self.min_relevance:
+            return self._generate_no_match_analysis(resume_text, jd_pre, similarity)
+        
+        # Look for a previous analysis of this resume against a paraphrased job description
+        resume_key = make_resume_key(resume_text, self.model)
+        embedding = jd_pre.embedding
+        if embedding is not None:
+            cached_payload = await self.semantic_cache.search(resume_key, embedding)
+            if cached_payload is not None:
+                logger.info("Semantic cache hit")
+                _cache_status.set("HIT")
+                result = AnalysisResult(**cached_payload)
+                await self.cache.set(cache_key, result)
+                return result
+        
+        return _PreparedAnalysis(
+            resume_text=truncated_resume,
+            job_description=jd_pre.truncated,
+            cache_key=cache_key,
+            resume_key=resume_key,
+            embedding=embedding,
+            jd_pre=jd_pre
+        )
+    
+    async def _finalize_analysis(self, prepared: "_PreparedAnalysis", analysis_data: Dict) -> AnalysisResult:
+        """Validate the merged AI response and store it in both caches."""
+        # Parse and validate response (CPU work, kept off the event loop)
+        result = await run_in_threadpool(self._parse_analysis_response, analysis_data)
+        logger.info(
+            "Final analysis result: missing_keywords=%d, keyword_matches=%d",
+            len(result.missing_keywords), len(result.keyword_matches)
+        )
+        
+        await self.cache.set(prepared.cache_key, result)
+        if prepared.embedding is not None:
+            await self.semantic_cache.add(prepared.resume_key, prepared.embedding, result.dict())
+        return result
+    
+    async def _embed_for_cache(self, job_description: str):
+        """Embed the job description for semantic cache lookup; returns None if disabled or on failure."""
+        if self.semantic_cache is None:
+            return None
         
         try:
-            # Generate analysis using AI
-            logger.info("Calling OpenAI API for analysis")
-            analysis_data = await self._generate_analysis(resume_text, job_description)
-            
-            # Parse and validate response
-            result = self._parse_analysis_response(analysis_data)
-            logger.info(f"Final analysis result: missing_keywords={len(result.missing_keywords)}, keyword_matches={len(result.keyword_matches)}")
-            
-            return result
-            
+            async with self.rate_limiter:
+                response = await self.client.embeddings.create(
+                    model=self.embedding_model, input=job_description[:4000]
+                )
+            return SemanticCache.normalize(response.data[0].embedding)
         except Exception as e:
-            logger.error(f"AI analysis failed: {str(e)}")
-            return self._generate_fallback_analysis(resume_text, job_description)
+            logger.error("Embedding for semantic cache failed: %s", e)
+            return None
     
-    def _is_meaningful_job_description(self, job_description: str) -> bool:
+    def _is_meaningful_job_description(self, job_description: str) -> Tuple[bool, str]:
         """
-        ENHANCED: Detects dummy text, Lorem Ipsum, and other non-job content.
+        Memoized front for _check_meaningful_job_description.
+        
+        Returns (is_meaningful, cleaned) where cleaned is the stripped,
+        lowercased job description, so callers can reuse it instead of
+        lowercasing again. Results are kept in a per-analyzer LRU keyed by
+        a 128-bit BLAKE2b digest of that buffer, so resubmitted job
+        descriptions skip the scan entirely.
         """
         cleaned = job_description.strip().lower()
+        digest = hashlib.blake2b(cleaned.encode("utf-8"), digest_size=16).digest()
+        
+        with self._meaningful_lock:
+            cached = self._meaningful_cache.get(digest)
+            if cached is not None:
+                self._meaningful_cache.move_to_end(digest)
+                return cached, cleaned
+        
+        is_meaningful = self._check_meaningful_job_description(cleaned)
+        
+        with self._meaningful_lock:
+            self._meaningful_cache[digest] = is_meaningful
+            if len(self._meaningful_cache) > MEANINGFUL_CACHE_SIZE:
+                self._meaningful_cache.popitem(last=False)
+        
+        return is_meaningful, cleaned
+    
+    @staticmethod
+    def _trust_job_description(job_description: str) -> Tuple[bool, str]:
+        """Validator for verified job descriptions: always meaningful, same cleaned buffer."""
+        return True, job_description.strip().lower()
+    
+    def _check_meaningful_job_description(self, cleaned: str) -> bool:
+        """
+        ENHANCED: Detects dummy text, Lorem Ipsum, and other non-job content.
+        
+        Expects the job description already stripped and lowercased.
+        """
         
         # Check minimum length
         if len(cleaned) < 30:
             logger.info("Job description too short")
             return False
         
-        # CRITICAL FIX: Detect Lorem Ipsum and dummy text patterns
-        lorem_ipsum_indicators = [
-            'lorem ipsum', 'dolor sit amet', 'consectetur adipiscing',
-            'sed do eiusmod', 'tempor incididunt', 'labore et dolore',
-            'magna aliqua', 'enim ad minim', 'veniam quis nostrud',
-            'exercitation ullamco', 'laboris nisi', 'aliquip ex ea',
-            'commodo consequat', 'duis aute irure', 'reprehenderit in voluptate',
-            'esse cillum', 'fugiat nulla pariatur', 'excepteur sint occaecat',
-            'cupidatat non proident', 'sunt in culpa'
-        ]
+        # Count every indicator category in a single pass over the text
+        lorem_count, dummy_count, indicator_count, professional_count, specific_count = (
+            _count_indicator_phrases(cleaned)
+        )
         
-        # Check for Lorem Ipsum
-        lorem_count = sum(1 for phrase in lorem_ipsum_indicators if phrase in cleaned)
+        # CRITICAL FIX: Detect Lorem Ipsum and dummy text patterns
         if lorem_count >= 2:
-            logger.info(f"Detected Lorem Ipsum text ({lorem_count} indicators found)")
+            logger.info("Detected Lorem Ipsum text (%d indicators found)", lorem_count)
             return False
         
         # Check for other dummy text patterns
-        dummy_text_patterns = [
-            'dummy text', 'placeholder text', 'sample text',
-            'test content', 'filler text', 'example text',
-            'typesetting industry', 'printing industry',
-            'galley of type', 'type specimen book',
-            'letraset sheets', 'aldus pagemaker',
-            'desktop publishing software'
-        ]
-        
-        dummy_count = sum(1 for pattern in dummy_text_patterns if pattern in cleaned)
         if dummy_count >= 2:
-            logger.info(f"Detected dummy/placeholder text ({dummy_count} patterns found)")
+            logger.info("Detected dummy/placeholder text (%d patterns found)", dummy_count)
             return False
         
         # Check for repetitive random patterns
@@ -122,60 +943,25 @@ class AIAnalyzer:
             logger.info("Job description has too few words")
             return False
         
-        # Detect obviously fake content
-        random_patterns = 0
-        for word in words[:15]:  # Check first 15 words
-            if len(word) > 3:
-                # Check if word is mostly repeated characters
-                if len(set(word)) <= 2 and len(word) > 4:
-                    random_patterns += 1
-                # Check for keyboard patterns
-                if word in ['asdf', 'qwerty', 'zxcv', 'asdfgh', 'qwertyui']:
-                    random_patterns += 5
+        # Detect obviously fake content in the first 15 words
+        random_patterns = sum(
+            5 if match.group("keyboard") else 1
+            for match in _RANDOM_RE.finditer(" ".join(words[:15]))
+        )
         
         if random_patterns > 2:
             logger.info("Job description contains random keyboard patterns")
             return False
         
         # Check for actual job-related content (more comprehensive)
-        job_indicators = [
-            # Core job terms
-            'experience', 'required', 'responsibilities', 'qualifications', 'skills',
-            'role', 'position', 'candidate', 'team', 'work', 'job',
-            
-            # Action words
-            'develop', 'manage', 'support', 'create', 'build', 'design',
-            'implement', 'maintain', 'collaborate', 'lead', 'analyze',
-            
-            # Technical terms
-            'technical', 'development', 'engineering', 'programming',
-            'software', 'application', 'system', 'technology', 'tools',
-            
-            # Business terms
-            'business', 'project', 'client', 'customer', 'product',
-            'service', 'solutions', 'requirements', 'processes',
-            
-            # Qualification terms
-            'degree', 'education', 'certification', 'training',
-            'knowledge', 'ability', 'expertise', 'proficiency'
-        ]
-        
-        indicator_count = sum(1 for indicator in job_indicators if indicator in cleaned)
-        logger.info(f"Found {indicator_count} job indicators")
+        logger.info("Found %d job indicators", indicator_count)
         
         # Need at least 3 real job indicators (increased from 1)
         if indicator_count < 3:
             logger.info("Not enough job indicators found")
             
             # Additional check for professional terms
-            professional_terms = [
-                'company', 'organization', 'department', 'office',
-                'salary', 'benefits', 'remote', 'onsite', 'hybrid',
-                'full-time', 'part-time', 'contract', 'permanent'
-            ]
-            
-            professional_count = sum(1 for term in professional_terms if term in cleaned)
-            logger.info(f"Found {professional_count} professional terms")
+            logger.info("Found %d professional terms", professional_count)
             
             # Need both job indicators AND professional terms
             if indicator_count < 2 or professional_count < 1:
@@ -183,16 +969,7 @@ class AIAnalyzer:
         
         # Final check: ensure it's not just marketing copy or generic text
         # Real job descriptions should mention specific requirements or skills
-        specific_terms = [
-            'python', 'java', 'javascript', 'react', 'angular', 'vue',
-            'sql', 'database', 'api', 'aws', 'azure', 'docker',
-            'git', 'agile', 'scrum', 'testing', 'debugging',
-            'bachelor', 'master', 'degree', 'years of experience',
-            'minimum', 'preferred', 'must have', 'should have'
-        ]
-        
-        specific_count = sum(1 for term in specific_terms if term in cleaned)
-        logger.info(f"Found {specific_count} specific job terms")
+        logger.info("Found %d specific job terms", specific_count)
         
         # Either have good job indicators OR specific requirements
         if indicator_count >= 3 or (indicator_count >= 2 and specific_count >= 1):
@@ -221,117 +998,251 @@ class AIAnalyzer:
             confidence_score=0.0
         )
     
-    async def _generate_analysis(self, resume_text: str, job_description: str) -> Dict:
-        """Generate AI analysis with strict instructions."""
+    def _generate_no_match_analysis(
+        self,
+        resume_text: str,
+        jd_pre: PreprocessedJobDescription,
+        similarity: float
+    ) -> AnalysisResult:
+        """
+        Return analysis for a resume that shares almost no terms with the job description.
+        
+        Learning Concept: Cheap Pre-filters
+        - A local TF-IDF cosine costs microseconds; an AI call costs seconds and tokens
+        - Obvious mismatches are answered locally, and the similarity
+          seeds the score and confidence
+        """
+        logger.info("Generating no-match analysis")
+        keyword_matches, missing_keywords = self._match_tech_keywords(resume_text, jd_pre.tech_keywords)
+        
+        return AnalysisResult(
+            ats_score=max(1, round(similarity * 100)),
+            strengths=["Resume processed successfully"],
+            improvements=[
+                "Resume shares almost no terminology with this job description",
+                "Highlight experience and skills that relate to the role's requirements",
+                "Use the job description's wording for skills you genuinely have"
+            ],
+            missing_keywords=missing_keywords,
+            keyword_matches=keyword_matches,
+            overall_feedback="This resume does not appear to match the job description, so no detailed analysis was run.",
+            confidence_score=round(1.0 - similarity, 2)
+        )
+    
+    def _build_messages(self, resume_text: str, job_description: str, instructions: str) -> List[Dict[str, str]]:
+        """
+        Build the chat messages, ordered from most to least reusable.
+        
+        OpenAI caches identical prompt prefixes, so the constant system prompt
+        goes first, then the resume (stable across job descriptions for the
+        same user), then the job description, and the per-task instructions
+        come last so all three analysis calls share the same prefix.
+        """
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": _RESUME_TEMPLATE % resume_text},
+            {"role": "user", "content": _JOB_DESCRIPTION_TEMPLATE % job_description},
+            {"role": "user", "content": instructions}
+        ]
+    
+    def _completion_params(
+        self,
+        resume_text: str,
+        job_description: str,
+        instructions: str,
+        response_format: Dict,
+        max_tokens: int
+    ) -> Dict:
+        """Chat completion parameters shared by realtime and batch requests."""
+        return {
+            "model": self.model,
+            "messages": self._build_messages(resume_text, job_description, instructions),
+            "max_tokens": min(max_tokens, self.max_tokens),
+            "temperature": self.temperature,
+            "response_format": response_format
+        }
+    
+    async def _complete_json(
+        self,
+        resume_text: str,
+        job_description: str,
+        instructions: str,
+        response_format: Dict,
+        max_tokens: int,
+        on_delta: Optional[Callable[[str], None]] = None
+    ) -> Dict:
+        """
+        Run one chat completion and decode its JSON object.
+        
+        When on_delta is given the completion is streamed and every content
+        chunk is passed to it as it arrives.
+        """
         
-        system_prompt = """You are an expert ATS analyst. Your job is to compare the resume against the SPECIFIC job description provided.
-
-CRITICAL INSTRUCTIONS:
-1. ONLY analyze if the job description appears to be a real job posting
-2. If the job description contains Lorem Ipsum, placeholder text, or dummy content, respond with an error
-3. Extract specific skills, technologies, and requirements ONLY from the actual job description
-4. Do NOT add general industry knowledge or assume requirements
-5. Be literal and precise in your keyword matching
-
-You must respond with a JSON object containing:
-- ats_score: Integer 0-100 based on actual job requirements match
-- strengths: Array of specific strengths found in resume relative to job description
-- improvements: Array of specific improvements needed for this job
-- missing_keywords: Array of terms from job description not found in resume
-- keyword_matches: Array of terms found in both resume and job description
-- overall_feedback: Brief summary based on actual comparison
-- confidence_score: Float 0.0-1.0
-
-If job description appears to be placeholder/dummy text, return ats_score: 0 and explain the issue."""
-
-        user_prompt = f"""
-RESUME TEXT:
-{resume_text}
-
-JOB DESCRIPTION:
-{job_description}
-
-Analyze this resume against the specific job description. Only extract keywords and requirements that are explicitly mentioned in the job description above.
-
-Respond with JSON only."""
-
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=self.max_tokens,
-                temperature=0.1,  # Very low temperature for precise analysis
-                response_format={"type": "json_object"}
-            )
+            async with self.rate_limiter:
+                response = await self.client.chat.completions.create(
+                    **self._completion_params(resume_text, job_description, instructions, response_format, max_tokens),
+                    stream=on_delta is not None
+                )
             
-            content = response.choices[0].message.content
-            analysis_data = json.loads(content)
+            if on_delta is None:
+                content = response.choices[0].message.content
+            else:
+                parts = []
+                async for chunk in response:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        on_delta(delta)
+                content = "".join(parts)
             
-            # If AI detected dummy text, return appropriate response
-            if analysis_data.get("ats_score", 0) == 0:
-                logger.info("AI detected invalid job description")
-                return {
-                    "ats_score": 0,
-                    "strengths": ["Resume processed successfully"],
-                    "improvements": ["Please provide a real job description"],
-                    "missing_keywords": [],
-                    "keyword_matches": [],
-                    "overall_feedback": "Invalid job description provided. Please use a real job posting.",
-                    "confidence_score": 0.0
-                }
+            if len(content) > LARGE_JSON_BYTES:
+                return await run_in_threadpool(orjson.loads, content)
+            return orjson.loads(content)
             
-            logger.info(f"AI returned {len(analysis_data.get('missing_keywords', []))} missing keywords and {len(analysis_data.get('keyword_matches', []))} matches")
-            
-            return analysis_data
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse AI response as JSON: {e}")
+        except orjson.JSONDecodeError as e:
+            logger.error("Failed to parse AI response as JSON: %s", e)
             raise HTTPException(status_code=500, detail="AI response parsing failed")
         
         except Exception as e:
-            logger.error(f"OpenAI API call failed: {e}")
+            logger.error("OpenAI API call failed: %s", e)
             raise HTTPException(status_code=500, detail="AI analysis service unavailable")
     
-    def _parse_analysis_response(self, analysis_data: Dict) -> AnalysisResult:
-        """Parse and validate AI response into structured format."""
+    async def _extract_keywords(self, resume_text: str, job_description: str, on_delta=None) -> Dict:
+        """Keyword matches and gaps between resume and job description."""
+        return await self._complete_json(resume_text, job_description, *ANALYSIS_SECTIONS["keywords"], on_delta)
+    
+    async def _extract_qualitative(self, resume_text: str, job_description: str, resume_lines: List[str], on_delta=None) -> Dict:
+        """Strengths, improvements and overall feedback."""
+        data = await self._complete_json(resume_text, job_description, *ANALYSIS_SECTIONS["qualitative"], on_delta)
+        data["strengths"] = self._resolve_line_pointers(data.get("strengths", []), resume_lines)
+        return data
+    
+    async def _extract_score(self, resume_text: str, job_description: str, on_delta=None) -> Dict:
+        """ATS score and confidence."""
+        return await self._complete_json(resume_text, job_description, *ANALYSIS_SECTIONS["score"], on_delta)
+    
+    async def _generate_analysis(
+        self,
+        resume_text: str,
+        job_description: str,
+        on_delta: Optional[Callable[[str, str], None]] = None
+    ) -> Dict:
+        """
+        Generate AI analysis as three focused calls run concurrently.
         
-        try:
-            ats_score = max(0, min(100, int(analysis_data.get("ats_score", 0))))
+        Backend Engineering Concept: Task Decomposition
+        - Each call asks for a small, related group of fields
+        - asyncio.gather runs them at the same time, so latency is the
+          slowest call instead of one long generation of every field
+        
+        If on_delta is given, each call streams and reports (section, chunk).
+        """
+        
+        # Number the resume lines so strengths can be returned as pointers
+        resume_lines, numbered_resume = self._number_lines(resume_text)
+        
+        def section_delta(section: str):
+            return functools.partial(on_delta, section) if on_delta else None
+        
+        keywords, qualitative, score = await asyncio.gather(
+            self._extract_keywords(numbered_resume, job_description, section_delta("keywords")),
+            self._extract_qualitative(numbered_resume, job_description, resume_lines, section_delta("qualitative")),
+            self._extract_score(numbered_resume, job_description, section_delta("score"))
+        )
+        
+        return self._merge_sections(keywords, qualitative, score)
+    
+    def _merge_sections(self, keywords: Dict, qualitative: Dict, score: Dict) -> Dict:
+        """Combine the three section responses into one analysis dict."""
+        
+        # If AI detected dummy text, return appropriate response
+        if score.get("ats_score", 0) == 0:
+            logger.info("AI detected invalid job description")
+            return {
+                "ats_score": 0,
+                "strengths": ["Resume processed successfully"],
+                "improvements": ["Please provide a real job description"],
+                "missing_keywords": [],
+                "keyword_matches": [],
+                "overall_feedback": "Invalid job description provided. Please use a real job posting.",
+                "confidence_score": 0.0
+            }
+        
+        analysis_data = {**keywords, **qualitative, **score}
+        logger.info(
+            "AI returned %d missing keywords and %d matches",
+            len(analysis_data.get("missing_keywords", [])), len(analysis_data.get("keyword_matches", []))
+        )
+        
+        return analysis_data
+    
+    @staticmethod
+    def _split_lines(text: str) -> List[str]:
+        """Split resume text into non-empty lines for pointer prompting."""
+        return [line for line in _LINE_SPLIT_RE.split(text) if line]
+    
+    def _number_lines(self, resume_text: str) -> Tuple[List[str], str]:
+        """Return the resume lines and the numbered text sent to the model."""
+        resume_lines = self._split_lines(resume_text)
+        return resume_lines, "\n".join(f"{i}: {line}" for i, line in enumerate(resume_lines))
+    
+    @staticmethod
+    def _resolve_line_pointers(strengths: List, resume_lines: List[str]) -> List[str]:
+        """
+        Turn {"lines": [a, b], "label": ...} pointers back into readable strengths.
+        
+        Learning Concept: Pointer Prompting
+        - The model returns line ranges instead of copying resume text
+        - Output tokens (and latency) drop; the server slices the text itself
+        """
+        resolved = []
+        for item in strengths:
+            if isinstance(item, str):
+                resolved.append(item)
+                continue
+            if not isinstance(item, dict):
+                continue
             
-            strengths = analysis_data.get("strengths", [])[:5]
-            improvements = analysis_data.get("improvements", [])[:5]
-            missing_keywords = analysis_data.get("missing_keywords", [])[:10]
-            keyword_matches = analysis_data.get("keyword_matches", [])[:10]
+            label = str(item.get("label", "")).strip()
+            excerpt = ""
+            try:
+                first, last = (int(n) for n in item.get("lines", [])[:2])
+                excerpt = " ".join(resume_lines[max(first, 0):last + 1])
+            except (TypeError, ValueError):
+                pass
             
-            overall_feedback = analysis_data.get("overall_feedback", "Analysis completed")
-            confidence_score = max(0.0, min(1.0, float(analysis_data.get("confidence_score", 0.0))))
+            if len(excerpt) > 150:
+                excerpt = excerpt[:150].rstrip() + "..."
             
-            return AnalysisResult(
-                ats_score=ats_score,
-                strengths=strengths,
-                improvements=improvements,
-                missing_keywords=missing_keywords,
-                keyword_matches=keyword_matches,
-                overall_feedback=overall_feedback,
-                confidence_score=confidence_score
-            )
+            if label and excerpt:
+                resolved.append(f"{label} — {excerpt}")
+            elif label or excerpt:
+                resolved.append(label or excerpt)
+        
+        return resolved
+    
+    def _parse_analysis_response(self, analysis_data: Dict) -> AnalysisResult:
+        """Parse and validate AI response into structured format."""
+        
+        try:
+            return AnalysisResult.parse_obj(analysis_data)
             
         except (KeyError, ValueError, TypeError) as e:
-            logger.error(f"Failed to parse analysis response: {e}")
+            logger.error("Failed to parse analysis response: %s", e)
             return self._generate_no_job_description_analysis("")
     
-    def _generate_fallback_analysis(self, resume_text: str, job_description: str) -> AnalysisResult:
+    def _generate_fallback_analysis(self, resume_text: str, jd_pre: PreprocessedJobDescription) -> AnalysisResult:
         """Generate fallback analysis when AI fails."""
         
         logger.info("Generating fallback analysis")
         
-        if not self._is_meaningful_job_description(job_description):
+        if not jd_pre.is_meaningful:
             return self._generate_no_job_description_analysis(resume_text)
         
-        # Simple fallback only for valid job descriptions
+        # Simple fallback only for valid job descriptions, with a local keyword scan
+        keyword_matches, missing_keywords = self._match_tech_keywords(resume_text, jd_pre.tech_keywords)
+        
         return AnalysisResult(
             ats_score=40,
             strengths=[
@@ -342,36 +1253,127 @@ Respond with JSON only."""
                 "AI analysis temporarily unavailable",
                 "Please try again later for detailed feedback"
             ],
-            missing_keywords=[],
-            keyword_matches=[],
+            missing_keywords=missing_keywords[:10],
+            keyword_matches=keyword_matches[:10],
             overall_feedback="Fallback analysis mode. AI service temporarily unavailable.",
             confidence_score=0.2
         )
     
-    def _truncate_text(self, text: str, max_length: int) -> str:
-        """Truncate text to prevent API token limits."""
-        if len(text) <= max_length:
-            return text
+    @staticmethod
+    def _extract_tech_keywords(text: str) -> frozenset:
+        """Tech keywords and phrases present in text (one regex pass plus phrase checks)."""
+        return AIAnalyzer._scan_tech_keywords(text.lower())
+    
+    @staticmethod
+    def _scan_tech_keywords(lowered: str) -> frozenset:
+        """_extract_tech_keywords for text that is already lowercased."""
+        found = TECH_KEYWORDS & set(TOKEN_RE.findall(lowered))
+        return found | {phrase for phrase in TECH_PHRASES if phrase in lowered}
+    
+    def _match_tech_keywords(self, resume_text: str, jd_keywords: frozenset) -> Tuple[List[str], List[str]]:
+        """Split the job description's tech keywords into (matched, missing) for the resume."""
+        resume_keywords = self._extract_tech_keywords(resume_text)
+        return sorted(jd_keywords & resume_keywords), sorted(jd_keywords - resume_keywords)
+    
+    @staticmethod
+    def _load_encoding(model: str) -> Optional["tiktoken.Encoding"]:
+        """The model's tokenizer, or None if it can't be loaded (e.g. offline)."""
+        try:
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                # Model unknown to this tiktoken release
+                return tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.warning("Token encoding unavailable, truncating by characters: %s", e)
+            return None
+    
+    def _truncate_text(self, text: str, max_tokens: int) -> str:
+        """
+        Truncate text to a token budget to respect API token limits.
+        
+        OpenAI limits and bills by tokens, so the budget is measured with
+        the model's own tokenizer. Only the first TOKENIZER_CHARS_PER_TOKEN
+        characters per budgeted token are encoded, so a huge resume costs no
+        more to truncate than one just over the budget. Without a tokenizer,
+        CHARS_PER_TOKEN_FALLBACK characters count as a token.
+        """
+        if self.encoding is None:
+            max_length = max_tokens * CHARS_PER_TOKEN_FALLBACK
+            if len(text) <= max_length:
+                return text
+        else:
+            window = text[:max_tokens * TOKENIZER_CHARS_PER_TOKEN]
+            tokens = self.encoding.encode(window, disallowed_special=())
+            if len(tokens) <= max_tokens and len(window) == len(text):
+                return text
+            text = self.encoding.decode(tokens[:max_tokens])
+            max_length = len(text)
         
-        truncated = text[:max_length]
-        last_period = truncated.rfind('.')
+        # Prefer ending on a sentence in the last 20% of the window; searching
+        # the original string avoids copying the window just to scan it
+        last_period = text.rfind('.', int(max_length * 0.8) + 1, max_length)
         
-        if last_period > max_length * 0.8:
-            return truncated[:last_period + 1]
+        if last_period != -1:
+            return text[:last_period + 1]
         
-        return truncated + "..."
-
-# Singleton instance
-_ai_analyzer_instance = None
+        return text[:max_length] + "..."
 
-async def get_ai_analyzer() -> AIAnalyzer:
-    global _ai_analyzer_instance
-    
-    if _ai_analyzer_instance is None:
-        _ai_analyzer_instance = AIAnalyzer()
+def get_ai_analyzer(request: Request) -> AIAnalyzer:
+    """
+    Dependency returning the analyzer built at startup (app.state.analyzer).
     
-    return _ai_analyzer_instance
+    Backend Engineering Concept: Dependency Injection
+    - The app owns one analyzer per worker process, created before traffic arrives
+    - Endpoints receive it through Depends instead of lazily building a
+      global, so there is no first-request lock or handshake
+    """
+    analyzer = getattr(request.app.state, "analyzer", None)
+    if analyzer is None:
+        raise HTTPException(status_code=503, detail="AI analysis service is not configured")
+    return analyzer
+
+async def preprocess_job_description(
+    analyzer: AIAnalyzer,
+    job_description: str,
+    trusted: bool = False,
+    embed: bool = True
+) -> PreprocessedJobDescription:
+    """Run the resume-independent job description work, including the cache embedding."""
+    return await analyzer.prepare_job_description(job_description, trusted, embed)
+
+async def analyze_resume_with_ai(
+    analyzer: AIAnalyzer,
+    resume_text: str,
+    job_description: str,
+    jd_pre: Optional[PreprocessedJobDescription] = None,
+    trusted: bool = False
+) -> AnalysisResult:
+    return await analyzer.analyze_resume(resume_text, job_description, jd_pre, trusted)
+
+async def analyze_many_with_ai(
+    analyzer: AIAnalyzer,
+    resumes: List[str],
+    job_description: str,
+    trusted: bool = False
+) -> List[Union[AnalysisResult, BaseException]]:
+    return await analyzer.analyze_many(resumes, job_description, trusted)
+
+async def stream_analysis_with_ai(
+    analyzer: AIAnalyzer,
+    resume_text: str,
+    job_description: str,
+    jd_pre: Optional[PreprocessedJobDescription] = None
+) -> AsyncIterator[Dict]:
+    async for event in analyzer.stream_analysis(resume_text, job_description, jd_pre):
+        yield event
+
+async def submit_batch_analysis(analyzer: AIAnalyzer, jobs: List[Tuple[str, str]]) -> Dict:
+    return await analyzer.submit_batch(jobs)
+
+async def get_batch_analysis(analyzer: AIAnalyzer, batch_id: str) -> Dict:
+    return await analyzer.get_batch_results(batch_id)
 
-async def analyze_resume_with_ai(resume_text: str, job_description: str) -> AnalysisResult:
-    analyzer = await get_ai_analyzer()
-    return await analyzer.analyze_resume(resume_text, job_description)
\ No newline at end of file
+def get_cache_status() -> str:
+    """Return "HIT" or "MISS" for the most recent analysis in the current request."""
+    return _cache_status.get()
@@ -0,0 +1,235 @@
+# app/services/analysis_cache.py
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import orjson
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(resume_text: str, job_description: str, model: str, temperature: float) -> str:
+    """
+    Build a deterministic cache key for an analysis request.
+
+    Inputs are whitespace-trimmed so the same documents map to the same key,
+    and the model settings are included so a config change never serves
+    stale results.
+    """
+    payload = orjson.dumps(
+        {"r": resume_text.strip(), "j": job_description.strip(), "m": model, "t": temperature},
+        option=orjson.OPT_SORT_KEYS
+    )
+    return hashlib.sha256(payload).hexdigest()
+
+
+class AnalysisCache:
+    """
+    In-process exact-match cache with TTL expiry and LRU eviction.
+
+    Backend Engineering Concept: Caching Expensive Calls
+    - Identical (resume, job description) pairs skip the OpenAI round-trip
+    - Entries expire after a TTL so results don't live forever
+    - Least recently used entries are evicted once the cache is full
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired."""
+        async with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: Any) -> None:
+        """Store value under key, evicting the least recently used entries if full."""
+        async with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def make_resume_key(resume_text: str, model: str) -> str:
+    """
+    Exact key for a resume, scoping semantic cache entries to one resume.
+
+    Semantic matches are only ever made between job descriptions for the
+    same resume, so one candidate can never be served another's analysis.
+    """
+    payload = orjson.dumps({"r": resume_text.strip(), "m": model}, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(payload).hexdigest()
+
+
+class SemanticCache:
+    """
+    Embedding-based cache that matches paraphrased job descriptions.
+
+    Backend Engineering Concept: Semantic Caching
+    - Entries are scoped by an exact resume key; only the job description
+      is embedded, so a hit is always an analysis of the same resume
+    - Each job description is stored as a normalized embedding vector
+    - A lookup is a brute-force inner-product search (cosine similarity)
+      over that resume's entries
+    - Vectors live in a preallocated ring buffer, so inserts never copy the matrix
+    - Entries expire after a TTL and are optionally persisted to SQLite
+    """
+
+    def __init__(
+        self,
+        model: str,
+        threshold: float = 0.92,
+        max_entries: int = 10000,
+        ttl_seconds: float = 86400.0,
+        db_path: Optional[str] = None
+    ):
+        self.model = model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+
+        # Ring buffer: slot i holds _vectors[i], _payloads[i], _keys[i], _expires[i]
+        self._vectors: Optional[np.ndarray] = None
+        self._payloads: List[Optional[Dict]] = [None] * max_entries
+        self._keys: List[Optional[str]] = [None] * max_entries
+        self._expires = np.zeros(max_entries, dtype=np.float64)
+        self._next_slot = 0
+        self._slots_by_key: Dict[str, Set[int]] = {}
+        self._lock = asyncio.Lock()
+
+        if self.db_path:
+            self._load()
+
+    @staticmethod
+    def normalize(vector: List[float]) -> np.ndarray:
+        """Scale an embedding to unit length so inner product equals cosine similarity."""
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    async def search(self, resume_key: str, vector: np.ndarray) -> Optional[Dict]:
+        """Return the payload of this resume's most similar entry if it clears the threshold."""
+        async with self._lock:
+            slots = self._slots_by_key.get(resume_key)
+            if not slots:
+                return None
+
+            slot_index = np.fromiter(slots, dtype=np.intp, count=len(slots))
+            slot_index = slot_index[self._expires[slot_index] >= time.time()]
+            if not len(slot_index):
+                return None
+
+            similarities = self._vectors[slot_index] @ vector
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            payload = self._payloads[int(slot_index[best])]
+
+        logger.info("Semantic cache best similarity: %.3f", similarity)
+        if similarity >= self.threshold:
+            return payload
+        return None
+
+    async def add(self, resume_key: str, vector: np.ndarray, payload: Dict) -> None:
+        """Store an entry in the next ring slot, overwriting the oldest when full."""
+        expires_at = time.time() + self.ttl_seconds
+        async with self._lock:
+            self._store(resume_key, vector, payload, expires_at)
+
+        if self.db_path:
+            await asyncio.to_thread(self._persist, resume_key, vector, payload, expires_at)
+
+    def _store(self, resume_key: str, vector: np.ndarray, payload: Dict, expires_at: float) -> None:
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+        slot = self._next_slot
+        old_key = self._keys[slot]
+        if old_key is not None:
+            old_slots = self._slots_by_key[old_key]
+            old_slots.discard(slot)
+            if not old_slots:
+                del self._slots_by_key[old_key]
+
+        self._vectors[slot] = vector
+        self._payloads[slot] = payload
+        self._keys[slot] = resume_key
+        self._expires[slot] = expires_at
+        self._slots_by_key.setdefault(resume_key, set()).add(slot)
+        self._next_slot = (slot + 1) % self.max_entries
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_cache ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "model TEXT NOT NULL, "
+            "resume_key TEXT NOT NULL, "
+            "embedding BLOB NOT NULL, "
+            "payload TEXT NOT NULL, "
+            "expires_at REAL NOT NULL)"
+        )
+        return conn
+
+    def _load(self) -> None:
+        """Load the most recent unexpired persisted entries for this model."""
+        try:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    "SELECT resume_key, embedding, payload, expires_at FROM semantic_cache "
+                    "WHERE model = ? AND expires_at >= ? ORDER BY id DESC LIMIT ?",
+                    (self.model, time.time(), self.max_entries)
+                ).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.error("Failed to load semantic cache: %s", e)
+            return
+
+        for resume_key, blob, payload, expires_at in reversed(rows):
+            self._store(resume_key, np.frombuffer(blob, dtype=np.float32), orjson.loads(payload), expires_at)
+        logger.info("Loaded %d semantic cache entries", len(rows))
+
+    def _persist(self, resume_key: str, vector: np.ndarray, payload: Dict, expires_at: float) -> None:
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM semantic_cache WHERE expires_at < ?", (time.time(),))
+                    conn.execute(
+                        "INSERT INTO semantic_cache (model, resume_key, embedding, payload, expires_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (self.model, resume_key, vector.astype(np.float32).tobytes(),
+                         orjson.dumps(payload).decode(), expires_at)
+                    )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.error("Failed to persist semantic cache entry: %s", e)
+
+    def __len__(self) -> int:
+        return len(self._payloads) - self._payloads.count(None)
@@ -1,10 +1,83 @@
 # app/services/file_parser.py
 
+import asyncio
+import codecs
 import io
-from typing import Union
-import PyPDF2
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Callable, Optional, Union
+import pypdfium2 as pdfium
+from charset_normalizer import from_bytes
 from docx import Document
 from fastapi import UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.services.upload_stream import get_upload_size
+
+# Plain-text uploads are decoded this many bytes at a time
+TXT_CHUNK_BYTES = 64 * 1024
+
+# Leading bytes of a plain-text upload used to detect its encoding
+TXT_SNIFF_BYTES = 4096
+
+# Encodings the sniffer chooses between once strict UTF-8 fails; open-ended
+# detection misreads short Western European text as cp1250, cp1006 and the like
+TXT_SNIFF_ENCODINGS = ["utf_8", "cp1252", "utf_16"]
+
+# Runs of whitespace collapsed to a single space in extracted PDF text
+_WS_RE = re.compile(r"\s+")
+
+# PDFium is not thread-safe, even across different documents, so every
+# PDFium call in this process runs under this lock
+_PDFIUM_LOCK = threading.Lock()
+
+# PDF/DOCX uploads at least this large are parsed in a separate process;
+# smaller ones aren't worth the cost of shipping the bytes to a worker
+PROCESS_POOL_MIN_BYTES = 256 * 1024
+
+# Created on first use, one per server worker
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+def _default_parser_processes() -> int:
+    """Split the cores between the server workers, since each one has its own pool."""
+    cpus = os.cpu_count() or 1
+    workers = int(os.getenv("WEB_CONCURRENCY", cpus))
+    return max(1, cpus // max(1, workers))
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # spawn, not fork: the server process already runs threads and an event loop
+        _process_pool = ProcessPoolExecutor(
+            max_workers=int(os.getenv("PARSER_PROCESSES", _default_parser_processes())),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+def _parse_bytes(parse: Callable[[BinaryIO], str], content: bytes) -> str:
+    """Process pool entry point: run a file parser over the uploaded bytes."""
+    return parse(io.BytesIO(content))
+
+def _trim_utf8_tail(head: bytes) -> bytes:
+    """Drop a multi-byte UTF-8 character cut off by the end of a sniff window."""
+    # Step back over continuation bytes (10xxxxxx) to the character's lead byte
+    lead = len(head) - 1
+    while lead >= max(0, len(head) - 4) and head[lead] & 0xC0 == 0x80:
+        lead -= 1
+    if lead < 0 or head[lead] < 0xC0:
+        return head
+    width = 2 if head[lead] < 0xE0 else 3 if head[lead] < 0xF0 else 4
+    return head[:lead] if len(head) - lead < width else head
+
+def close_parser_pool() -> None:
+    """Shut down the parser processes, if any were started."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
 
 class FileParser:
     """
@@ -31,22 +104,17 @@ class FileParser:
             HTTPException: If file type unsupported or processing fails
         """
         
-        # Read file content into memory
-        file_content = await file.read()
-        
-        # Reset file pointer for potential re-reading
-        await file.seek(0)
-        
         # Get file extension
         filename = file.filename.lower()
         
         try:
             if filename.endswith('.pdf'):
-                return FileParser._extract_from_pdf(file_content)
+                return await FileParser._run_parser(file, FileParser._extract_from_pdf)
             elif filename.endswith('.docx'):
-                return FileParser._extract_from_docx(file_content)
+                return await FileParser._run_parser(file, FileParser._extract_from_docx)
             elif filename.endswith('.txt'):
-                return FileParser._extract_from_txt(file_content)
+                # Decoding and encoding detection are CPU work even for in-memory uploads
+                return await run_in_threadpool(FileParser._extract_from_txt, file.file)
             else:
                 raise HTTPException(
                     status_code=400,
@@ -60,7 +128,25 @@ class FileParser:
             )
     
     @staticmethod
-    def _extract_from_pdf(file_content: bytes) -> str:
+    async def _run_parser(file: UploadFile, parse: Callable[[BinaryIO], str]) -> str:
+        """
+        Run a CPU-bound document parser off the event loop.
+        
+        Backend Engineering Concept: Process Pools
+        - Threads share the GIL, so pure-Python XML/PDF work in a thread
+          still competes with the event loop
+        - Large uploads are parsed in a separate process on its own core
+        - Small uploads stay in a thread, reading the spooled file directly
+        """
+        if get_upload_size(file) < PROCESS_POOL_MIN_BYTES:
+            return await run_in_threadpool(parse, file.file)
+        
+        content = await run_in_threadpool(file.file.read)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_process_pool(), _parse_bytes, parse, content)
+    
+    @staticmethod
+    def _extract_from_pdf(pdf_file: BinaryIO) -> str:
         """
         Extract text from PDF file.
         
@@ -68,30 +154,36 @@ class FileParser:
         - PDFs are binary files, not plain text
         - Need specialized libraries to parse structure
         - Handle potential corruption or password protection
+        - PDFium (Chromium's C engine) extracts text far faster than a
+          pure-Python parser
         """
         text_content = []
         
         try:
-            # Create file-like object from bytes
-            pdf_file = io.BytesIO(file_content)
-            
-            # Create PDF reader
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            # Check if PDF is encrypted
-            if pdf_reader.is_encrypted:
-                raise Exception("PDF is password protected")
-            
-            # Extract text from each page
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text_content.append(page.extract_text())
+            with _PDFIUM_LOCK:
+                # Open the PDF; encrypted files fail here without a password
+                try:
+                    pdf = pdfium.PdfDocument(pdf_file)
+                except pdfium.PdfiumError as e:
+                    if "password" in str(e).lower():
+                        raise Exception("PDF is password protected")
+                    raise
+                
+                # Extract text from each page
+                try:
+                    for page in pdf:
+                        textpage = page.get_textpage()
+                        text_content.append(textpage.get_text_bounded())
+                        textpage.close()
+                        page.close()
+                finally:
+                    pdf.close()
             
             # Join all pages with newlines
             full_text = "\n".join(text_content)
             
             # Clean up text (remove extra whitespace)
-            cleaned_text = " ".join(full_text.split())
+            cleaned_text = _WS_RE.sub(" ", full_text).strip()
             
             if not cleaned_text.strip():
                 raise Exception("No text found in PDF")
@@ -102,7 +194,7 @@ class FileParser:
             raise Exception(f"PDF processing error: {str(e)}")
     
     @staticmethod
-    def _extract_from_docx(file_content: bytes) -> str:
+    def _extract_from_docx(docx_file: BinaryIO) -> str:
         """
         Extract text from Word document.
         
@@ -112,9 +204,6 @@ class FileParser:
         - Can access paragraphs, tables, headers separately
         """
         try:
-            # Create file-like object from bytes
-            docx_file = io.BytesIO(file_content)
-            
             # Load document
             doc = Document(docx_file)
             
@@ -136,25 +225,44 @@ class FileParser:
             raise Exception(f"DOCX processing error: {str(e)}")
     
     @staticmethod
-    def _extract_from_txt(file_content: bytes) -> str:
+    def _extract_from_txt(txt_file: BinaryIO) -> str:
         """
         Extract text from plain text file.
         
         Learning Concept: Text Encoding
-        - Text files can have different encodings (UTF-8, UTF-16, etc.)
-        - Try common encodings if one fails
+        - Text files can have different encodings (UTF-8, UTF-16, cp1252, etc.)
+        - Most uploads are UTF-8, so try a strict UTF-8 decode first
+        - Otherwise pick between a few likely encodings from the first few KB,
+          then decode in one pass; cp1252 is the default when nothing fits
         - Handle special characters properly
         """
         try:
-            # Try UTF-8 first (most common)
+            start = txt_file.tell()
+            
             try:
-                text = file_content.decode('utf-8')
+                text = FileParser._decode_stream(txt_file, 'utf-8-sig')
             except UnicodeDecodeError:
-                # Fallback to other common encodings
+                text = None
+            
+            if text is None:
+                # Sniff the encoding from the head of the file
+                txt_file.seek(start)
+                head = txt_file.read(TXT_SNIFF_BYTES)
+                if len(head) == TXT_SNIFF_BYTES:
+                    head = _trim_utf8_tail(head)
+                match = from_bytes(head, cp_isolation=TXT_SNIFF_ENCODINGS).best()
+                encoding = match.encoding if match else 'cp1252'
+                txt_file.seek(start)
+                
                 try:
-                    text = file_content.decode('utf-16')
+                    # A UTF-8 head means the invalid bytes come later; keep the
+                    # text and replace just those bytes
+                    errors = 'replace' if encoding == 'utf_8' else 'strict'
+                    text = FileParser._decode_stream(txt_file, encoding, errors)
                 except UnicodeDecodeError:
-                    text = file_content.decode('latin-1')
+                    # latin-1 maps every byte, including those cp1252 leaves undefined
+                    txt_file.seek(start)
+                    text = FileParser._decode_stream(txt_file, 'latin-1')
             
             if not text.strip():
                 raise Exception("Text file is empty")
@@ -163,6 +271,16 @@ class FileParser:
             
         except Exception as e:
             raise Exception(f"Text file processing error: {str(e)}")
+    
+    @staticmethod
+    def _decode_stream(txt_file: BinaryIO, encoding: str, errors: str = 'strict') -> str:
+        """Decode a binary file in fixed-size chunks; multi-byte characters may span chunks."""
+        decoder = codecs.getincrementaldecoder(encoding)(errors)
+        parts = []
+        for chunk in iter(lambda: txt_file.read(TXT_CHUNK_BYTES), b""):
+            parts.append(decoder.decode(chunk))
+        parts.append(decoder.decode(b"", final=True))
+        return "".join(parts)
 
 # Helper function for easy importing
 async def parse_resume_file(file: UploadFile) -> str:
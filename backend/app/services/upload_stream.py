@@ -0,0 +1,90 @@
+# app/services/upload_stream.py
+
+import os
+from typing import AsyncGenerator
+from fastapi import Request, HTTPException
+from starlette.datastructures import FormData, UploadFile
+from starlette.formparsers import MultiPartParser
+
+# Maximum size of an uploaded resume
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+# Boundaries, part headers and the job description field travel in the same
+# body as the file, so the body limit leaves some room on top of the file limit.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+async def _limited_stream(request: Request, max_bytes: int) -> AsyncGenerator[bytes, None]:
+    """
+    Yield request body chunks, aborting as soon as the running total is too big.
+
+    Backend Engineering Concept: Backpressure
+    - The body is consumed chunk by chunk as it arrives from the socket
+    - Oversized uploads are rejected without ever holding them in memory
+    """
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum: {MAX_UPLOAD_BYTES // (1024 * 1024)}MB"
+            )
+        yield chunk
+
+
+async def read_upload_form(
+    request: Request,
+    max_bytes: int = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+) -> FormData:
+    """
+    Parse a multipart upload straight from the request stream.
+
+    File parts are written into Starlette's SpooledTemporaryFile as they
+    arrive, so the upload is buffered exactly once and never re-read just to
+    measure its size.
+
+    Args:
+        request: Incoming request with a multipart/form-data body
+        max_bytes: Maximum number of body bytes accepted
+
+    Returns:
+        Parsed form with UploadFile values for file parts
+
+    Raises:
+        HTTPException: If the body is not multipart or is (or claims to be)
+            larger than max_bytes
+    """
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
+        raise HTTPException(
+            status_code=400,
+            detail="Expected a multipart/form-data upload"
+        )
+
+    # Reject declared oversize bodies before reading a single byte. The
+    # running counter in _limited_stream still applies, so a client can't
+    # understate Content-Length and stream more.
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        try:
+            declared_bytes = int(content_length)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+
+        if declared_bytes > max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum: {MAX_UPLOAD_BYTES // (1024 * 1024)}MB"
+            )
+
+    parser = MultiPartParser(request.headers, _limited_stream(request, max_bytes))
+    return await parser.parse()
+
+
+def get_upload_size(upload: UploadFile) -> int:
+    """Return the size of a parsed upload by seeking its spooled file instead of reading it."""
+    upload.file.seek(0, os.SEEK_END)
+    size = upload.file.tell()
+    upload.file.seek(0)
+    return size
@@ -0,0 +1,22 @@
+# tests/conftest.py
+
+import asyncio
+import os
+
+import pytest
+from starlette.testclient import TestClient
+
+
+@pytest.fixture(scope="session")
+def client():
+    """App client started once per session, without an OpenAI API key."""
+    from app.main import app
+
+    # Imported first: app.main loads .env, which must not supply a real key
+    os.environ.pop("OPENAI_API_KEY", None)
+
+    # This Starlette TestClient runs on the current loop, which asyncio.run()
+    # in other tests leaves unset
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    with TestClient(app) as test_client:
+        yield test_client
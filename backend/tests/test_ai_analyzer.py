@@ -0,0 +1,153 @@
+# tests/test_ai_analyzer.py
+
+import asyncio
+import subprocess
+import sys
+
+import pytest
+
+from app.services.ai_analyzer import AIAnalyzer, TOKENIZER_CHARS_PER_TOKEN, _RANDOM_RE, get_cache_status
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("SEMANTIC_CACHE_ENABLED", "false")
+    return AIAnalyzer()
+
+
+def _random_score(text: str) -> int:
+    return sum(5 if m.group("keyboard") else 1 for m in _RANDOM_RE.finditer(text))
+
+
+def test_random_pattern_scores():
+    assert _random_score("aaaaa ababab asdf") == 7
+    assert _random_score("aaaa abcab hello") == 0
+
+
+def test_random_pattern_regex_is_linear_on_near_repeats():
+    # A long word that almost matches used to backtrack exponentially; run it
+    # in a subprocess so a regression fails on the timeout instead of hanging
+    code = (
+        "from app.services.ai_analyzer import _RANDOM_RE\n"
+        "assert not list(_RANDOM_RE.finditer('a' * 5000 + 'bc'))\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True, timeout=10)
+
+
+def test_near_repeat_job_description_is_checked_quickly(analyzer):
+    job_description = "a" * 40 + "bc " + "python developer role with experience " * 3
+    is_meaningful, _ = analyzer._is_meaningful_job_description(job_description)
+    assert isinstance(is_meaningful, bool)
+
+
+class _CharEncoding:
+    """One token per character; records how much text it was asked to encode."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, text, disallowed_special=()):
+        self.encoded.append(len(text))
+        return list(text)
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+def test_truncate_text_encodes_only_a_window(analyzer):
+    analyzer.encoding = _CharEncoding()
+    text = "Built data pipelines in Python and SQL. " * 5000
+    
+    truncated = analyzer._truncate_text(text, 100)
+    
+    assert truncated == text[:100] + "..."
+    assert max(analyzer.encoding.encoded) <= 100 * TOKENIZER_CHARS_PER_TOKEN
+    assert analyzer._truncate_text("Short resume.", 100) == "Short resume."
+
+
+def test_build_messages_matches_fstring_rendering(analyzer):
+    resume_text = "Grew revenue 40% in 2023; 100%s uptime {braces} %(name)s"
+    job_description = "Own 50% of the roadmap.\n%d%% remote"
+    
+    messages = analyzer._build_messages(resume_text, job_description, "Score it.")
+    
+    assert [m["content"] for m in messages[1:]] == [
+        f"RESUME TEXT:\n{resume_text}",
+        f"JOB DESCRIPTION:\n{job_description}",
+        "Score it."
+    ]
+
+
+@pytest.mark.parametrize("from_ai, joiner_status", [(True, "HIT"), (False, "MISS")])
+def test_coalesce_joiner_hit_only_for_ai_results(analyzer, from_ai, joiner_status):
+    async def scenario():
+        release = asyncio.Event()
+        
+        async def run():
+            await release.wait()
+            return "result", from_ai
+        
+        async def request():
+            result = await analyzer._coalesce("key", run)
+            return result, get_cache_status()
+        
+        owner = asyncio.create_task(request())
+        await asyncio.sleep(0)
+        joiner = asyncio.create_task(request())
+        await asyncio.sleep(0)
+        release.set()
+        return await owner, await joiner
+    
+    owner, joiner = asyncio.run(scenario())
+    
+    assert owner == ("result", "MISS")
+    assert joiner == ("result", joiner_status)
+
+
+def test_job_description_is_embedded_during_preprocessing(analyzer, monkeypatch):
+    embedded = []
+    
+    async def embed(job_description):
+        embedded.append(job_description)
+        return "vector"
+    
+    monkeypatch.setattr(analyzer, "_embed_for_cache", embed)
+    job_description = (
+        "We are hiring a Senior Python Developer. Responsibilities: build and maintain REST APIs "
+        "with FastAPI, design PostgreSQL schemas, deploy services on AWS. Requirements: 5+ years "
+        "of experience with Python, Docker and CI/CD pipelines."
+    )
+    
+    jd_pre = asyncio.run(analyzer.prepare_job_description(job_description))
+    skipped = asyncio.run(analyzer.prepare_job_description(job_description, embed=False))
+    gibberish = asyncio.run(analyzer.prepare_job_description("asdf qwer zxcv"))
+    
+    assert jd_pre.embedding == "vector"
+    assert skipped.embedding is None
+    assert gibberish.embedding is None
+    assert embedded == [job_description]
+
+
+def test_coalesce_owner_cancellation_does_not_cancel_joiners(analyzer):
+    async def scenario():
+        release = asyncio.Event()
+        
+        async def run():
+            await release.wait()
+            return "result", True
+        
+        owner = asyncio.create_task(analyzer._coalesce("key", run))
+        await asyncio.sleep(0)
+        joiner = asyncio.create_task(analyzer._coalesce("key", run))
+        await asyncio.sleep(0)
+        owner.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return owner, await joiner
+    
+    owner, joined = asyncio.run(scenario())
+    
+    assert owner.cancelled()
+    assert joined == "result"
+    assert not analyzer._inflight
@@ -0,0 +1,60 @@
+# tests/test_analysis_cache.py
+
+import asyncio
+
+import numpy as np
+
+from app.services.analysis_cache import SemanticCache, make_resume_key
+
+
+def _vector(*values):
+    return SemanticCache.normalize(list(values))
+
+
+def test_semantic_matches_are_scoped_to_the_resume():
+    cache = SemanticCache(model="m", max_entries=4)
+    alice = make_resume_key("Alice resume", "m")
+    bob = make_resume_key("Bob resume", "m")
+
+    async def run():
+        await cache.add(alice, _vector(1, 0), {"ats_score": 80})
+        return await cache.search(alice, _vector(1, 0)), await cache.search(bob, _vector(1, 0))
+
+    own, other = asyncio.run(run())
+    assert own == {"ats_score": 80}
+    assert other is None
+
+
+def test_ring_buffer_overwrites_oldest_entry():
+    cache = SemanticCache(model="m", max_entries=2)
+    keys = [make_resume_key(f"resume {i}", "m") for i in range(3)]
+
+    async def run():
+        for i, key in enumerate(keys):
+            await cache.add(key, _vector(1, i), {"i": i})
+        return [await cache.search(key, _vector(1, i)) for i, key in enumerate(keys)]
+
+    assert asyncio.run(run()) == [None, {"i": 1}, {"i": 2}]
+    assert len(cache) == 2
+    assert cache._vectors.shape == (2, 2)
+
+
+def test_expired_entries_are_not_served():
+    cache = SemanticCache(model="m", ttl_seconds=-1)
+    key = make_resume_key("resume", "m")
+
+    async def run():
+        await cache.add(key, _vector(1, 0), {"ats_score": 80})
+        return await cache.search(key, _vector(1, 0))
+
+    assert asyncio.run(run()) is None
+
+
+def test_entries_survive_a_restart(tmp_path):
+    db_path = str(tmp_path / "semantic.db")
+    key = make_resume_key("resume", "m")
+    asyncio.run(SemanticCache(model="m", db_path=db_path).add(key, _vector(0, 1), {"ats_score": 70}))
+
+    reloaded = SemanticCache(model="m", db_path=db_path)
+    assert asyncio.run(reloaded.search(key, _vector(0, 1))) == {"ats_score": 70}
+    assert np.allclose(reloaded._vectors[0], _vector(0, 1))
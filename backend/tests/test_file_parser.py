@@ -0,0 +1,68 @@
+# tests/test_file_parser.py
+
+import asyncio
+import io
+import threading
+
+import pytest
+from fastapi import UploadFile
+
+from app.services.file_parser import TXT_SNIFF_BYTES, FileParser, _trim_utf8_tail
+
+
+def test_utf8_character_straddling_sniff_window():
+    # The sniff window ends one byte into the opening quote, and a stray
+    # cp1252 byte past the window makes the strict UTF-8 decode fail
+    prefix = "Résumé " * (TXT_SNIFF_BYTES // 9)
+    prefix += "x" * (TXT_SNIFF_BYTES - 1 - len(prefix.encode("utf-8")))
+    head = prefix + "“Senior engineer” – café"
+    data = head.encode("utf-8") + b" \x92 Python"
+    
+    assert FileParser._extract_from_txt(io.BytesIO(data)) == head + " \ufffd Python"
+
+
+def test_utf8_bom_is_dropped():
+    data = "﻿Resume text".encode("utf-8")
+    assert FileParser._extract_from_txt(io.BytesIO(data)) == "Resume text"
+
+
+def test_utf16_falls_back_to_detection():
+    text = "Experienced Python developer with a background in data engineering."
+    assert FileParser._extract_from_txt(io.BytesIO(text.encode("utf-16"))) == text
+
+
+@pytest.mark.parametrize("text", [
+    "café résumé",
+    "Senior engineer with a naïve approach to “quoted” work – 2019",
+])
+def test_cp1252_resumes_decode(text):
+    assert FileParser._extract_from_txt(io.BytesIO(text.encode("cp1252"))) == text
+
+
+def test_bytes_undefined_in_cp1252_fall_back_to_latin1():
+    data = b"Resume \x81 text"
+    assert FileParser._extract_from_txt(io.BytesIO(data)) == data.decode("latin-1")
+
+
+def test_trim_utf8_tail():
+    quote = "“".encode("utf-8")
+    assert _trim_utf8_tail(b"ab" + quote[:2]) == b"ab"
+    assert _trim_utf8_tail(b"ab" + quote[:1]) == b"ab"
+    assert _trim_utf8_tail(b"ab" + quote) == b"ab" + quote
+    assert _trim_utf8_tail(b"abc") == b"abc"
+
+
+def test_in_memory_txt_is_decoded_off_the_event_loop(monkeypatch):
+    threads = []
+    
+    def extract(txt_file):
+        threads.append(threading.current_thread())
+        return "Resume text"
+    
+    monkeypatch.setattr(FileParser, "_extract_from_txt", staticmethod(extract))
+    upload = UploadFile("resume.txt")  # backed by an in-memory spooled file
+    upload.file.write(b"Resume text")
+    upload.file.seek(0)
+    
+    assert asyncio.run(FileParser.extract_text_from_file(upload)) == "Resume text"
+    assert threads and threads[0] is not threading.main_thread()
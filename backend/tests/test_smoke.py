@@ -0,0 +1,61 @@
+# tests/test_smoke.py
+
+from types import SimpleNamespace
+
+import httpx
+from openai import NotFoundError
+
+import app.main
+from app.services.ai_analyzer import AIAnalyzer, get_ai_analyzer
+
+
+def test_app_imports_with_routes():
+    paths = {route.path for route in app.main.app.routes}
+    assert {"/health", "/analyze", "/analyze/stream", "/analyze/many", "/analyze/batch/{batch_id}"} <= paths
+
+
+def test_health(client):
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "healthy"
+
+
+def test_analyze_without_api_key_is_unavailable(client):
+    response = client.post(
+        "/analyze",
+        files={"resume": ("resume.txt", b"Python developer", "text/plain")},
+        data={"job_description": "Senior Python developer"}
+    )
+    assert response.status_code == 503
+
+
+class _MissingBatchAnalyzer:
+    async def get_batch_results(self, batch_id):
+        request = httpx.Request("GET", f"https://api.openai.com/v1/batches/{batch_id}")
+        raise NotFoundError("No such batch", response=httpx.Response(404, request=request), body=None)
+
+
+def test_unknown_batch_is_not_found(client):
+    client.app.dependency_overrides[get_ai_analyzer] = _MissingBatchAnalyzer
+    try:
+        response = client.get("/analyze/batch/batch_missing")
+    finally:
+        client.app.dependency_overrides.clear()
+    assert response.status_code == 404
+
+
+class _ForeignBatches:
+    async def retrieve(self, batch_id):
+        return SimpleNamespace(id=batch_id, status="completed", output_file_id="file-other", metadata={})
+
+
+def test_batch_from_another_source_is_not_found(client, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    analyzer = AIAnalyzer()
+    analyzer.client.batches = _ForeignBatches()
+    client.app.dependency_overrides[get_ai_analyzer] = lambda: analyzer
+    try:
+        response = client.get("/analyze/batch/batch_foreign")
+    finally:
+        client.app.dependency_overrides.clear()
+    assert response.status_code == 404